@@ -7,9 +7,14 @@ import csv
 import numpy as np
 import os
 import re
+import time
 from datetime import datetime
+from pathlib import Path
 from sentence_transformers import SentenceTransformer
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from near_dup import NEAR_DUP_THRESHOLD, NearDupFilter, exact_digest
+
 # 1. INCREASE CSV LIMIT for massive legal emails
 csv.field_size_limit(sys.maxsize)
 
@@ -92,10 +97,31 @@ def clean_and_date_email(raw_text):
     return f"{date_str}{clean_body}"
 
 # --- INGESTION (ROBUST V2) ---
-def ingest_file(filepath):
+def ingest_file(filepath, near_dup_threshold=NEAR_DUP_THRESHOLD):
     print(f"Reading {filepath}...")
     chunks = []
     seen_hashes = set() # For deduplication
+    near_dups = NearDupFilter(near_dup_threshold) if near_dup_threshold else None
+    exact_dropped = near_dropped = 0
+    dedup_seconds = 0.0
+
+    def is_new(text):
+        """Exact then near-duplicate check, before anything is embedded."""
+        nonlocal exact_dropped, near_dropped, dedup_seconds
+        t0 = time.perf_counter()
+        try:
+            # DEDUPLICATION (stable across runs, unlike the salted hash())
+            text_hash = exact_digest(text)
+            if text_hash in seen_hashes:
+                exact_dropped += 1
+                return False
+            seen_hashes.add(text_hash)
+            # NEAR-DUPLICATES: quoted replies, forwards, signature variants
+            if near_dups is not None and near_dups.check(text[:5000]) is not None:
+                near_dropped += 1
+                return False
+            return True
+        finally: dedup_seconds += time.perf_counter() - t0
 
     if filepath.endswith('.csv'):
         with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
@@ -108,20 +134,25 @@ def ingest_file(filepath):
 
                 # CLEAN & EXTRACT DATE
                 clean_text = clean_and_date_email(raw)
-                
-                # DEDUPLICATION
-                text_hash = hash(clean_text)
-                if text_hash in seen_hashes:
-                    continue # Skip duplicate
-                seen_hashes.add(text_hash)
+                if not is_new(clean_text): continue # Skip duplicate
 
                 # Append (Increased limit to 5000 chars for 16GB RAM assumption)
                 chunks.append(clean_text[:5000]) 
     else:
-        with open(filepath, 'r') as f: chunks = [p for p in f.read().split('\n\n') if len(p) > 20]
+        with open(filepath, 'r') as f: chunks = [p for p in f.read().split('\n\n') if len(p) > 20 and is_new(p)]
+
+    total = len(chunks) + exact_dropped + near_dropped
+    if total:
+        print(f"Dedup: {exact_dropped} exact + {near_dropped} near-duplicates removed of {total} "
+              f"({100 * (exact_dropped + near_dropped) / total:.1f}% smaller corpus, {dedup_seconds:.1f}s)")
 
     print(f"Embedding {len(chunks)} unique items...")
+    t0 = time.perf_counter()
     vectors = embed_model.encode(chunks, show_progress_bar=True)
+    embed_seconds = time.perf_counter() - t0
+    if chunks and near_dropped:
+        saved = embed_seconds / len(chunks) * near_dropped
+        print(f"Near-dup filter saved ~{saved:.1f}s of embedding (net ~{saved - dedup_seconds:.1f}s before entity linking).")
     
     memory_data = []
     use_entities = len(chunks) < 500 
@@ -214,6 +245,12 @@ def query_system(query):
     except Exception as e: print(e)
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2 and sys.argv[1] == "ingest": ingest_file(sys.argv[2])
+    # --near-dup 0.9 tunes the Jaccard threshold, --near-dup off disables the stage
+    threshold = NEAR_DUP_THRESHOLD
+    if "--near-dup" in sys.argv:
+        i = sys.argv.index("--near-dup")
+        threshold = None if sys.argv[i + 1] == "off" else float(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+    if len(sys.argv) > 2 and sys.argv[1] == "ingest": ingest_file(sys.argv[2], near_dup_threshold=threshold)
     elif len(sys.argv) > 1 and sys.argv[1] == "query": query_system(" ".join(sys.argv[2:]))
-    else: print("Usage: uv run elerag.py [ingest file.csv | query 'Question']")
\ No newline at end of file
+    else: print("Usage: uv run elerag.py [ingest file.csv [--near-dup T|off] | query 'Question']")
\ No newline at end of file
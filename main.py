@@ -1,5 +1,16 @@
+import sys
+from pathlib import Path
+
+# The pipeline modules live in src/ and import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
 def main():
-    print("Hello from elerag!")
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        import bench
+        bench.main(sys.argv[2:])
+    else:
+        import elerag_improved
+        elerag_improved.main(sys.argv[1:])
 
 
 if __name__ == "__main__":
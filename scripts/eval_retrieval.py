@@ -0,0 +1,94 @@
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+import elerag_improved as elerag
+
+# Scores the dense, entity and fused (RRF) retrievers of the published index
+# against the queries and qrels written by generate_huge_corpus.py:
+#   recall@k                 share of relevant docs found in the top k
+#   hit@k                    share of queries with any relevant doc in the top k
+#                            (topic queries can have more relevant docs than k)
+#   disambiguation_accuracy  share of queries whose top hit is the asked-for
+#                            sense (same word and domain), relevant or not
+# Results are reported for all queries and per query kind ("code", "topic").
+KS = (1, 5, 10, 15)
+# ingest prefixes every CSV row with "[Unit - Subtopic]", i.e. [domain - word]
+SENSE_PREFIX = re.compile(r"^\[(.*?) - (.*?)\]")
+LEGS = ("dense", "entity", "fused")
+
+def load_eval_set(stem):
+    with open(f"{stem}.queries.jsonl", 'r', encoding='utf-8') as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    qrels = {}
+    with open(f"{stem}.qrels", 'r', encoding='utf-8') as f:
+        for line in f:
+            qid, _, doc_id, rel = line.split()
+            if int(rel) > 0: qrels.setdefault(qid, set()).add(int(doc_id))
+    return queries, qrels
+
+def sense_of(text):
+    m = SENSE_PREFIX.match(text)
+    return (m.group(2), m.group(1)) if m else None
+
+def summarize(scores, ks):
+    n = max(1, len(scores))
+    return {leg: {"recall": {f"@{k}": round(sum(s[leg]["recall"][k] for s in scores) / n, 4) for k in ks},
+                  "hit": {f"@{k}": round(sum(s[leg]["hit"][k] for s in scores) / n, 4) for k in ks},
+                  "disambiguation_accuracy": round(sum(s[leg]["sense"] for s in scores) / n, 4)}
+            for leg in LEGS}
+
+def evaluate(index, queries, qrels, ks=KS):
+    depth = max(ks)
+    by_kind = {}
+    for q in queries:
+        relevant = qrels.get(q["id"], set())
+        query_vec = elerag.encode_query(q["query"])
+        dense, entity = index.search(query_vec, elerag.extract_entities(q["query"]), dense_k=depth, entity_k=depth)
+        ranked = {"dense": [i for i, _ in dense], "entity": [i for i, _ in entity], "fused": elerag.rrf_fuse(dense, entity)}
+        docs = index.fetch(sorted({ids[0] for ids in ranked.values() if ids}))
+        score = {}
+        for leg, ids in ranked.items():
+            found = {k: len(relevant.intersection(ids[:k])) for k in ks}
+            score[leg] = {"recall": {k: found[k] / len(relevant) if relevant else 0.0 for k in ks},
+                          "hit": {k: float(found[k] > 0) for k in ks},
+                          "sense": bool(ids) and sense_of(docs[ids[0]]["text"]) == (q["word"], q["domain"])}
+        by_kind.setdefault(q.get("kind", "code"), []).append(score)
+
+    results = summarize([s for scores in by_kind.values() for s in scores], ks)
+    results["by_kind"] = {kind: {"queries": len(scores), **summarize(scores, ks)} for kind, scores in sorted(by_kind.items())}
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall@k, hit@k and disambiguation accuracy of each retriever.")
+    parser.add_argument("stem", help="corpus path without .csv; reads <stem>.queries.jsonl and <stem>.qrels")
+    parser.add_argument("--k", type=int, nargs="+", default=list(KS))
+    parser.add_argument("--limit", type=int, default=None, help="only the first N queries")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--ingest", action="store_true", help="ingest <stem>.csv first (same backends as the evaluation)")
+    parser.add_argument("--fake", action="store_true", help="use the benchmark's offline fake backends")
+    parser.add_argument("--out", default=None, help="also write the results JSON here")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        import bench
+        bench.install_fakes()
+    if args.ingest: elerag.ingest_file(f"{args.stem}.csv")
+    queries, qrels = load_eval_set(args.stem)
+    queries = queries[:args.limit]
+    index = elerag.open_index(args.shards)
+    if index is None: return print("Run 'ingest' on the generated corpus first.")
+    try: results = evaluate(index, queries, qrels, args.k)
+    finally: index.close()
+    elerag.save_cache()
+
+    results = {"queries": len(queries), **results}
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f: json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import csv
+import json
 import random
+import argparse
 
 # A dictionary of words with strictly conflicting meanings in different domains.
 # Structure: {Word: {Domain: [Facts...]}}
@@ -165,39 +167,167 @@ NOISE_SENTENCES = [
     "The archival process ensures data integrity over time."
 ]
 
-def generate_huge_csv(filename="chaos_corpus_large.csv"):
-    print(f"Generating massive dataset: {filename}...")
-    
+# Detail vocabulary per sense, so rows of one sense share a topic without
+# repeating each other
+DOMAIN_VOCAB = {
+    "Tech": ["cloud", "server", "latency", "firmware", "bandwidth", "device", "platform", "software",
+             "subscription", "datacenter", "sensor", "update", "network", "encryption", "interface"],
+    "Geography": ["river", "basin", "rainfall", "tributary", "delta", "canopy", "watershed", "estuary",
+                  "floodplain", "sediment", "latitude", "highland", "rainforest", "erosion", "valley"],
+    "CS": ["interpreter", "syntax", "library", "bytecode", "function", "module", "runtime", "compiler",
+           "iterator", "decorator", "thread", "exception", "package", "recursion", "typing"],
+    "Biology": ["species", "predator", "habitat", "venom", "genome", "mammal", "reptile", "protein",
+                "prey", "metabolism", "cell", "organism", "evolution", "breeding", "molting"],
+    "Fruit": ["orchard", "harvest", "cultivar", "blossom", "cider", "ripening", "pome", "pulp",
+              "grafting", "vitamin", "sweetness", "peel", "seedling", "pectin", "tartness"],
+    "Auto": ["engine", "chassis", "horsepower", "sedan", "gearbox", "torque", "coupe", "dealership",
+             "suspension", "supercharger", "bodywork", "exhaust", "dashboard", "roadster", "brakes"],
+    "Energy": ["refinery", "drilling", "pipeline", "crude", "offshore", "barrel", "hydrogen", "petrochemical",
+               "emissions", "turbine", "tanker", "reservoir", "upstream", "biofuel", "royalty"],
+    "Food": ["fried", "crispy", "snack", "salted", "recipe", "dough", "bakery", "flavor",
+             "seasoning", "vinegar", "batter", "crunch", "dessert", "cookie", "oven"],
+    "Nature": ["current", "creek", "spawning", "trout", "bank", "meander", "spring", "riffle",
+               "headwater", "pebble", "runoff", "wetland", "ripple", "gravel", "upstream"],
+    "Database": ["column", "index", "schema", "query", "join", "transaction", "primary", "foreign",
+                 "partition", "normalization", "record", "constraint", "view", "cursor", "replica"],
+    "Furniture": ["oak", "walnut", "legs", "varnish", "dining", "carpentry", "drawer", "veneer",
+                  "tabletop", "upholstery", "antique", "joinery", "polish", "workshop", "mahogany"],
+}
+GENERIC_VOCAB = ["report", "analysis", "framework", "quarter", "baseline", "review", "process", "summary",
+                 "stakeholder", "initiative", "benchmark", "outcome", "strategy", "milestone", "overview"]
+SENSES = [(word, domain) for word, domains in AMBIGUOUS_DATA.items() for domain in domains]
+DETAIL_WORDS = 3
+
+def row_code(word, i):
+    # Unique per row, so a code query has exactly one relevant document
+    return f"{word[:3].upper()}-{i:08d}"
+
+def sense_row(rng, i, word, domain):
+    base = rng.choice(AMBIGUOUS_DATA[word][domain])
+    detail = rng.sample(DOMAIN_VOCAB[domain], DETAIL_WORDS)
+    fact = f"{base} Entry {row_code(word, i)} links {word} with {', '.join(detail)}."
+    return fact, domain, word, detail
+
+def confuser_row(rng, i, word, domain):
+    """Names `word` in its own sense but borrows another sense's vocabulary."""
+    other = rng.choice([d for d in AMBIGUOUS_DATA[word] if d != domain])
+    detail = rng.sample(DOMAIN_VOCAB[other], DETAIL_WORDS - 1) + rng.sample(DOMAIN_VOCAB[domain], 1)
+    if rng.random() < 0.5:
+        fact = f"The relevance of the {word} in this context is subject to debate regarding {', '.join(detail)}."
+    else:
+        fact = f"{rng.choice(AMBIGUOUS_DATA[word][domain])} Note {row_code(word, i)} compares {word} to {', '.join(detail)}."
+    return fact, domain, word
+
+def noise_row(rng):
+    return f"{rng.choice(NOISE_SENTENCES)} See {' '.join(rng.sample(GENERIC_VOCAB, DETAIL_WORDS))}.", "Noise", "General"
+
+def iter_rows(rows, seed, ambiguity, noise):
+    """Yield (row id, kind, [Fact, Unit, Subtopic], detail) in corpus order; detail is None unless kind is "sense"."""
+    rng = random.Random(seed)
+    for i in range(rows):
+        r = rng.random()
+        if r < noise:
+            yield i, "noise", list(noise_row(rng)), None
+            continue
+        word, domain = rng.choice(SENSES)
+        if r < noise + ambiguity:
+            yield i, "confuser", list(confuser_row(rng, i, word, domain)), None
+            continue
+        fact, domain, word, detail = sense_row(rng, i, word, domain)
+        yield i, "sense", [fact, domain, word], detail
+
+def make_code_query(rng, word, detail, code):
+    a, b, c = rng.sample(detail, 3)
+    return rng.choice([
+        f"Which {word} entry links {a} and {b} under code {code}?",
+        f"What does entry {code} say about {word}, {a} and {c}?",
+        f"Find the {word} record {code} about {b} and {c}.",
+    ])
+
+def make_topic_query(rng, word, detail):
+    a, b, c = rng.sample(detail, 3)
+    return rng.choice([
+        f"Which {word} entries link {a}, {b} and {c}?",
+        f"What connects {word} with {a}, {b} and {c}?",
+        f"Find {word} records about {a}, {b} and {c}.",
+    ])
+
+def generate_huge_csv(filename="chaos_corpus_large.csv", rows=10_000, seed=0, ambiguity=0.2, noise=0.2, queries=1000):
+    """Stream a seeded corpus plus <stem>.queries.jsonl and <stem>.qrels (TREC format).
+
+    Every row is one of three kinds:
+      sense     a fact about one sense of an ambiguous word, with a unique entry code
+      confuser  (ratio `ambiguity`) the word in one sense, described with another sense's vocabulary
+      noise     (ratio `noise`) filler with no ambiguous word at all
+    `queries` sense rows are chosen by reservoir sampling, and each gets two queries:
+      code      names the row's entry code; only that row is relevant
+      topic     no code, just the word and the row's detail words; every sense
+                row with the same word, domain and detail words is relevant,
+                so only the dense and entity retrievers can find them
+    The topic qrels come from a second pass over the same seeded rows, so
+    memory stays O(queries + relevant rows) at any corpus size. Doc ids are
+    CSV row numbers from 0, which is the id `ingest` assigns (every generated
+    row passes its length filter). The corpus only depends on `seed`, not on
+    how many queries are drawn.
+    """
+    if ambiguity < 0 or noise < 0 or ambiguity + noise > 1: raise ValueError("need ambiguity, noise >= 0 and ambiguity + noise <= 1")
+    stem = filename[:-4] if filename.endswith(".csv") else filename
+    pick = random.Random(seed + 1)
+    reservoir, n_sense = [], 0
+    counts = {"sense": 0, "confuser": 0, "noise": 0}
+    print(f"Generating {rows} rows into {filename} (seed {seed}, ambiguity {ambiguity}, noise {noise})...")
+
     with open(filename, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         writer.writerow(["Fact", "Unit", "Subtopic"])
-        
-        row_count = 0
-        
-        # 1. THE CORE DATA (Repeated to simulate a large corpus density)
-        # We repeat the definitions 5 times to ensure the vector space is crowded
-        for _ in range(5):
-            for word, domains in AMBIGUOUS_DATA.items():
-                for domain, facts in domains.items():
-                    for fact in facts:
-                        writer.writerow([fact, domain, word])
-                        row_count += 1
-        
-        # 2. THE CONFUSION LAYER (Slight variations)
-        # We take the words and scramble them into sentences that look relevant but are noise
-        for word in AMBIGUOUS_DATA.keys():
-            for _ in range(20):
-                sentence = f"The relevance of the {word} in this context is subject to debate regarding its classification."
-                writer.writerow([sentence, "Academic", "Confusion"])
-                row_count += 1
-
-        # 3. PURE NOISE (Filler to force the retriever to search harder)
-        for _ in range(200):
-            writer.writerow([random.choice(NOISE_SENTENCES), "Noise", "General"])
-            row_count += 1
-            
-    print(f"Done. Generated {row_count} rows.")
-    print("Run ingestion: uv run elerag_improved.py ingest chaos_corpus_large.csv")
+        for i, kind, row, detail in iter_rows(rows, seed, ambiguity, noise):
+            if i and i % 1_000_000 == 0: print(f"  {i} rows...")
+            writer.writerow(row)
+            counts[kind] += 1
+            if kind != "sense": continue
+            # Reservoir sampling (Algorithm R) over sense rows
+            n_sense += 1
+            if len(reservoir) < queries: reservoir.append((i, row[2], row[1], detail))
+            else:
+                j = pick.randrange(n_sense)
+                if j < queries: reservoir[j] = (i, row[2], row[1], detail)
+    reservoir.sort()
+
+    # Second pass: collect every row sharing a sampled row's sense and detail words
+    topics = {(word, domain, frozenset(detail)): [] for _, word, domain, detail in reservoir}
+    for i, kind, row, detail in iter_rows(rows, seed, ambiguity, noise):
+        if kind == "sense":
+            docs = topics.get((row[2], row[1], frozenset(detail)))
+            if docs is not None: docs.append(i)
+
+    qrng = random.Random(seed + 2)
+    n_topic_rels = 0
+    with open(f"{stem}.queries.jsonl", 'w', encoding='utf-8') as fq, open(f"{stem}.qrels", 'w', encoding='utf-8') as fr:
+        for n, (i, word, domain, detail) in enumerate(reservoir):
+            code_query = make_code_query(qrng, word, detail, row_code(word, i))
+            topic_query = make_topic_query(qrng, word, detail)
+            for qid, kind, query, docs in [(f"q{n:06d}c", "code", code_query, [i]),
+                                           (f"q{n:06d}t", "topic", topic_query, topics[(word, domain, frozenset(detail))])]:
+                fq.write(json.dumps({"id": qid, "kind": kind, "query": query, "word": word, "domain": domain}) + "\n")
+                for doc_id in docs: fr.write(f"{qid} 0 {doc_id} 1\n")
+            n_topic_rels += len(topics[(word, domain, frozenset(detail))])
+
+    print(f"Done. Generated {rows} rows ({counts['sense']} sense, {counts['confuser']} confuser, {counts['noise']} noise)"
+          f" and {2 * len(reservoir)} queries with qrels ({n_topic_rels / max(1, len(reservoir)):.1f} relevant rows per topic query).")
+    print(f"Run ingestion: python main.py ingest {filename}")
+    print(f"Then evaluate: python scripts/eval_retrieval.py {stem}")
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seeded synthetic corpus of ambiguous entities, with queries and qrels.")
+    parser.add_argument("--out", default="chaos_corpus_large.csv")
+    parser.add_argument("--rows", type=int, default=10_000, help="corpus rows (10^4 to 10^7 is the intended range)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ambiguity", type=float, default=0.2, help="fraction of confuser rows")
+    parser.add_argument("--noise", type=float, default=0.2, help="fraction of filler rows")
+    parser.add_argument("--queries", type=int, default=1000, help="sense rows to sample; each yields a code and a topic query")
+    args = parser.parse_args(argv)
+    generate_huge_csv(args.out, args.rows, args.seed, args.ambiguity, args.noise, args.queries)
 
 if __name__ == "__main__":
-    generate_huge_csv()
+    main()
@@ -1,13 +1,20 @@
 import os
 import re
-import pandas as pd
+import csv
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pypdf import PdfReader
 
 # --- CONFIGURATION ---
 PDF_SOURCE_FOLDER = "raw_pdfs"
 # CHANGED: This now writes to a separate file, protecting your original work
-OUTPUT_CSV = "ep_dump.csv" 
+OUTPUT_CSV = "ep_dump.csv"
+# Size, mtime and content hash of every PDF already in OUTPUT_CSV
+MANIFEST_FILE = "ep_dump.manifest.json"
 MIN_SENTENCE_LENGTH = 25
+PAGES_PER_TASK = 16
+WORKERS = os.cpu_count() or 1
 
 def clean_text(text):
     # Fixes broken lines common in PDFs
@@ -25,57 +32,147 @@ def split_into_facts(text):
             clean_facts.append(s)
     return clean_facts
 
+def fact_digest(fact):
+    return hashlib.blake2b(fact.encode('utf-8'), digest_size=16).digest()
+
+def file_hash(filepath):
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+    return h.hexdigest()
+
+# --- WORKERS (run in the process pool) ---
+def count_pages(filepath):
+    return len(PdfReader(filepath).pages)
+
+def extract_pages(filepath, start, end):
+    reader = PdfReader(filepath)
+    return "".join(reader.pages[i].extract_text() or "" for i in range(start, end))
+
+# --- MANIFEST ---
+def load_manifest():
+    # Without the CSV the manifest describes facts we no longer have
+    if not os.path.exists(OUTPUT_CSV): return {}
+    try:
+        with open(MANIFEST_FILE, 'r') as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+def save_manifest(manifest):
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, 'w') as f: json.dump(manifest, f, indent=1)
+    os.replace(tmp, MANIFEST_FILE)
+
+def find_changed(files, manifest):
+    """Split files into (changed, unchanged); hashes only when size or mtime moved."""
+    changed, unchanged = [], 0
+    for filename in files:
+        st = os.stat(os.path.join(PDF_SOURCE_FOLDER, filename))
+        entry = manifest.get(filename)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            unchanged += 1
+            continue
+        digest = file_hash(os.path.join(PDF_SOURCE_FOLDER, filename))
+        if entry and entry["sha256"] == digest:
+            # Touched but identical: refresh the stat so next run skips it cheaply
+            entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            unchanged += 1
+            continue
+        changed.append((filename, {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}))
+    return changed, unchanged
+
+def load_seen_facts():
+    seen = set()
+    if not os.path.exists(OUTPUT_CSV): return seen
+    with open(OUTPUT_CSV, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get("Fact"): seen.add(fact_digest(row["Fact"]))
+    return seen
+
 def process_pdfs():
-    all_new_facts = []
-    
     # 1. Setup Folder
     if not os.path.exists(PDF_SOURCE_FOLDER):
         os.makedirs(PDF_SOURCE_FOLDER)
         print(f"[Setup] Created folder '{PDF_SOURCE_FOLDER}'. Put PDF files here!")
         return
 
-    files = [f for f in os.listdir(PDF_SOURCE_FOLDER) if f.endswith(".pdf")]
-    
+    files = sorted(f for f in os.listdir(PDF_SOURCE_FOLDER) if f.endswith(".pdf"))
+
     if not files:
         print(f"[Error] No PDFs found in '{PDF_SOURCE_FOLDER}'.")
         return
 
-    print(f"[Start] Found {len(files)} PDFs. Extracting text...")
+    manifest = load_manifest()
+    changed, unchanged = find_changed(files, manifest)
+    print(f"[Start] Found {len(files)} PDFs: {unchanged} unchanged, {len(changed)} to extract.")
+    if not changed:
+        save_manifest(manifest)
+        print(f"[Success] Nothing to do. {OUTPUT_CSV} is up to date.")
+        return
 
-    # 2. Extract Text
-    for filename in files:
-        filepath = os.path.join(PDF_SOURCE_FOLDER, filename)
-        print(f" -> Reading: {filename}...")
-        
-        try:
-            reader = PdfReader(filepath)
-            full_text = ""
-            for page in reader.pages:
-                full_text += page.extract_text() or ""
-                
-            cleaned_text = clean_text(full_text)
-            facts = split_into_facts(cleaned_text)
-            
-            all_new_facts.extend(facts)
-            print(f"    Extracted {len(facts)} facts.")
-            
-        except Exception as e:
-            print(f"    ERROR reading {filename}: {e}")
-
-    # 3. Save to NEW CSV
-    if all_new_facts:
-        print(f"[Saving] Writing {len(all_new_facts)} facts to '{OUTPUT_CSV}'...")
-        
-        # Create new DataFrame
-        df_final = pd.DataFrame(all_new_facts, columns=["Fact"])
-
-        # Remove Exact Duplicates
-        df_final = df_final.drop_duplicates().reset_index(drop=True)
-        
-        # Save
-        df_final.to_csv(OUTPUT_CSV, index=False)
-        print(f"[Success] Done! You now have a new database file: {OUTPUT_CSV}")
-        
+    # 2. Extract Text (pages of every file fan out across the pool)
+    seen = load_seen_facts()
+    new_file = not seen and not os.path.exists(OUTPUT_CSV)
+    written = duplicates = 0
+
+    with open(OUTPUT_CSV, 'a', newline='', encoding='utf-8') as out, ProcessPoolExecutor(WORKERS) as pool:
+        writer = csv.writer(out)
+        if new_file: writer.writerow(["Fact"])
+
+        counts = {pool.submit(count_pages, os.path.join(PDF_SOURCE_FOLDER, name)): name for name, _ in changed}
+        jobs = {name: {"entry": entry, "parts": None, "left": None, "failed": False} for name, entry in changed}
+        page_tasks = {}
+        for fut in as_completed(counts):
+            name = counts[fut]
+            job = jobs[name]
+            try: n_pages = fut.result()
+            except Exception as e:
+                print(f"    ERROR reading {name}: {e}")
+                job["failed"], job["left"] = True, 0
+                continue
+            ranges = [(s, min(s + PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, PAGES_PER_TASK)]
+            job["parts"], job["left"] = [""] * len(ranges), len(ranges)
+            for slot, (s, e) in enumerate(ranges):
+                page_tasks[pool.submit(extract_pages, os.path.join(PDF_SOURCE_FOLDER, name), s, e)] = (name, slot)
+
+        # 3. Stream each file's new facts to the CSV as soon as it and every
+        # file before it are done, so output order doesn't depend on timing
+        order = [name for name, _ in changed]
+        next_file = 0
+
+        def flush_ready():
+            nonlocal next_file, written, duplicates
+            while next_file < len(order) and jobs[order[next_file]]["left"] == 0:
+                name = order[next_file]
+                job = jobs.pop(name)
+                next_file += 1
+                if job["failed"]: continue
+                facts = split_into_facts(clean_text("".join(job["parts"])))
+                for fact in facts:
+                    digest = fact_digest(fact)
+                    if digest in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(digest)
+                    writer.writerow([fact])
+                    written += 1
+                out.flush()
+                manifest[name] = job["entry"]
+                print(f" -> {name}: extracted {len(facts)} facts.")
+
+        flush_ready()
+        for fut in as_completed(page_tasks):
+            name, slot = page_tasks.pop(fut)
+            job = jobs[name]
+            try: job["parts"][slot] = fut.result()
+            except Exception as e:
+                if not job["failed"]: print(f"    ERROR reading {name}: {e}")
+                job["failed"] = True
+            job["left"] -= 1
+            flush_ready()
+
+    save_manifest(manifest)
+    if written or duplicates:
+        print(f"[Success] Wrote {written} new facts to '{OUTPUT_CSV}' ({duplicates} duplicates skipped).")
     else:
         print("[Warning] No valid text found in PDFs.")
 
@@ -0,0 +1,240 @@
+import os
+import io
+import sys
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+from pathlib import Path
+import numpy as np
+import tracing
+import elerag_improved as elerag
+
+# End-to-end benchmark: generate a corpus, run ingest_file, then answer_query
+# for a fixed query set. The embedder, NLP pipeline, entity linker and LLM are
+# deterministic offline fakes by default, so numbers are comparable across
+# commits on a CPU-only box with no network and only measure our own code.
+
+FAKE_DIM = 384
+NAMES = ["Amazon", "Apple", "Python", "Jaguar", "Shell", "Mercury", "Enron", "Berkshire", "Oracle", "Tesla",
+         "Delta", "Orion", "Atlas", "Phoenix", "Titan", "Nova", "Vega", "Lyra", "Draco", "Cygnus"]
+TOPICS = ["Tech", "Biology", "Energy", "Finance", "Geography", "Law", "Food", "Auto"]
+WORDS = ["contract", "river", "cloud", "species", "engine", "pipeline", "merger", "lawsuit", "harvest", "server",
+         "forest", "battery", "filing", "market", "protein", "reactor", "license", "network", "island", "dividend",
+         "shipment", "patent", "orbit", "vaccine", "ledger", "turbine", "statute", "habitat", "compiler", "tariff"]
+STOP_WORDS = {"the", "a", "an", "of", "in", "on", "and", "to", "is", "was", "what", "which", "did", "does", "for", "by", "with"}
+
+def stable_hash(text, n_bytes=8):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=n_bytes).digest(), 'little')
+
+# --- FAKE BACKENDS ---
+class FakeEmbedder:
+    """Hashing-trick bag of words; same text always gives the same vector."""
+    max_seq_length = 256
+
+    def tokenizer(self, texts, truncation=True, max_length=None):
+        return {'input_ids': [t.split()[:max_length] for t in texts]}
+
+    def get_sentence_embedding_dimension(self):
+        return FAKE_DIM
+
+    def start_multi_process_pool(self, devices):
+        return None
+
+    def stop_multi_process_pool(self, pool):
+        pass
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        out = np.zeros((len(texts), FAKE_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                h = stable_hash(word)
+                out[row, h % FAKE_DIM] += 1.0 if (h >> 32) & 1 else -1.0
+            out[row, stable_hash(text) % FAKE_DIM] += 0.5  # nothing is all zeros
+        if normalize_embeddings: out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+class FakeToken:
+    def __init__(self, text):
+        self.text = text
+        self.is_alpha = text.isalpha()
+        self.is_stop = text.lower() in STOP_WORDS
+
+class FakeSpan:
+    def __init__(self, text, label, sent):
+        self.text, self.label_, self.sent = text, label, sent
+
+class FakeDoc:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = [FakeToken(w.strip(".,?![]-")) for w in text.split()]
+        sent = FakeSpan(text, "", None)
+        self.ents = []
+        for tok in self.tokens:
+            if tok.text in NAMES: self.ents.append(FakeSpan(tok.text, "ORG", sent))
+            elif tok.text.isdigit() and len(tok.text) == 4: self.ents.append(FakeSpan(tok.text, "DATE", sent))
+        self.sents = [sent]
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+def fake_nlp(text):
+    return FakeDoc(text)
+
+def fake_linker(text, context_sentence=None):
+    return f"Q{stable_hash(text) % 1000000}"
+
+def fake_llm(prompt):
+    # Echo the first context line, like a model that answers from retrieval
+    context = prompt.split("### Context:\n", 1)[-1].split("\n", 1)[0]
+    return f"{prompt}\n{context.split('] ', 1)[-1]}"
+
+def install_fakes():
+    elerag.RESOURCES.set("embed_model", FakeEmbedder())
+    elerag.RESOURCES.set("nlp", fake_nlp)
+    elerag.RESOURCES.set("linker", fake_linker)
+    elerag.RESOURCES.set("llm", fake_llm)
+
+# --- CORPUS ---
+def make_corpus(path, rows, seed):
+    """Seeded CSV in the Fact/Unit/Subtopic layout ingest_file expects."""
+    rng = random.Random(seed)
+    facts = []
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Fact", "Unit", "Subtopic"])
+        for i in range(rows):
+            name, topic = rng.choice(NAMES), rng.choice(TOPICS)
+            words = rng.sample(WORDS, rng.randint(4, 12))
+            fact = f"{name} {' '.join(words)} recorded in {rng.randint(1950, 2025)} entry {i}."
+            writer.writerow([fact, topic, name])
+            facts.append((name, topic, words))
+    return facts
+
+def make_queries(facts, n, seed):
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(n):
+        name, topic, words = rng.choice(facts)
+        queries.append(f"What does {name} have to do with the {' and '.join(words[:3])} in {topic}?")
+    return queries
+
+# --- MEASUREMENT ---
+def peak_rss_bytes(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def dir_bytes(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+def percentiles(samples):
+    arr = np.array(samples) * 1000
+    return {f"p{q}": round(float(np.percentile(arr, q)), 3) for q in (50, 95, 99)} | {"mean": round(float(arr.mean()), 3)}
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=elerag.BASE_DIR, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError: return None
+
+def quiet(verbose):
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+def stage_summary(traces):
+    """Mean milliseconds per stage and summed counters over a list of traces."""
+    stages, counters = {}, {}
+    for t in traces:
+        for name, secs in t.stages.items(): stages[name] = stages.get(name, 0.0) + secs
+        for name, n in t.counters.items(): counters[name] = counters.get(name, 0) + n
+    n = max(1, len(traces))
+    return {"mean_ms": {k: round(v * 1000 / n, 3) for k, v in sorted(stages.items(), key=lambda kv: -kv[1])},
+            "counters": counters}
+
+def time_queries(index, query_set, verbose):
+    """Per-query latencies (after one warm-up query) and how many got an answer."""
+    with quiet(verbose): elerag.answer_query(query_set[0], index)
+    latencies, answered = [], 0
+    for q in query_set:
+        start = time.perf_counter()
+        with quiet(verbose): answer = elerag.answer_query(q, index)
+        latencies.append(time.perf_counter() - start)
+        answered += answer is not None
+    return latencies, answered
+
+def shard_scaling(query_set, shard_counts, verbose):
+    """QPS for each shard count over the same snapshot and queries."""
+    out = []
+    for n in shard_counts:
+        index = elerag.open_index(n)
+        try: latencies, _ = time_queries(index, query_set, verbose)
+        finally: index.close()
+        out.append({"shards": n, "qps": round(len(latencies) / sum(latencies), 1), "latency_ms": percentiles(latencies)})
+    for entry in out: entry["speedup"] = round(entry["qps"] / out[0]["qps"], 2)
+    return out
+
+def run(rows=5000, queries=200, seed=0, shards=1, real=False, verbose=False, workdir=None, shard_sweep=()):
+    """Run one benchmark and return the results dict."""
+    if not real: install_fakes()
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        tmp = Path(tmp)
+        elerag.INDEX_DIR = tmp / "index"
+        elerag.ENTITY_CACHE_FILE = tmp / "entity_cache.json"
+        elerag.EMBED_CACHE_DIR = tmp / "embed_cache"
+
+        corpus = tmp / "corpus.csv"
+        facts = make_corpus(corpus, rows, seed)
+        query_set = make_queries(facts, queries, seed)
+
+        traces = []
+        tracing.SINKS.append(traces.append)
+        try:
+            start = time.perf_counter()
+            with quiet(verbose): elerag.ingest_file(str(corpus))
+            ingest_seconds = time.perf_counter() - start
+
+            index = elerag.open_index(shards)
+            try: latencies, answered = time_queries(index, query_set, verbose)
+            finally: index.close()
+            # Drop the warm-up query's trace
+            del traces[1]
+        finally: tracing.SINKS.remove(traces.append)
+        scaling = shard_scaling(query_set, shard_sweep, verbose) if shard_sweep else None
+
+        snapshot = elerag.current_snapshot(elerag.INDEX_DIR)
+        return {
+            "config": {"rows": rows, "queries": queries, "seed": seed, "shards": shards, "backends": "real" if real else "fake"},
+            "ingest": {"chunks": rows, "seconds": round(ingest_seconds, 3), "chunks_per_sec": round(rows / ingest_seconds, 1),
+                       "stages": stage_summary(traces[:1])},
+            "query": {"latency_ms": percentiles(latencies), "qps": round(len(latencies) / sum(latencies), 1), "answered": answered,
+                      "stages": stage_summary(traces[1:])},
+            **({"shard_scaling": scaling} if scaling else {}),
+            "memory": {"peak_rss_bytes": peak_rss_bytes(), "peak_rss_children_bytes": peak_rss_bytes(resource.RUSAGE_CHILDREN)},
+            "index": {"snapshot_bytes": dir_bytes(snapshot), "embed_cache_bytes": dir_bytes(elerag.EMBED_CACHE_DIR)},
+            "env": {"git": git_revision(), "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        }
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="main.py bench", description="Reproducible ingest/retrieval/generation benchmark.")
+    parser.add_argument("--rows", type=int, default=5000, help="corpus rows to generate and ingest")
+    parser.add_argument("--queries", type=int, default=200, help="queries to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1, help="query through N shard worker processes")
+    parser.add_argument("--shard-sweep", type=int, nargs="+", default=[], metavar="N",
+                        help="also time the query set at each shard count (e.g. 1 2 4) and report speedup")
+    parser.add_argument("--real", action="store_true", help="use the real models, linker and llama-cli instead of fakes")
+    parser.add_argument("--out", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output")
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, args.queries, args.seed, args.shards, args.real, args.verbose, shard_sweep=args.shard_sweep)
+    with open(args.out, 'w') as f: json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {args.out}")
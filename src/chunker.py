@@ -0,0 +1,70 @@
+from collections import deque
+
+# Characters read per sentencizer call; the last (possibly unfinished)
+# sentence of each window is carried into the next, so the sentences match a
+# single pass over the whole file while memory stays bounded by the window.
+WINDOW_CHARS = 200_000
+# A "sentence" that runs past this many characters without a boundary (tables,
+# unpunctuated dumps) is emitted as is, so the carry stays bounded and every
+# sentencizer call sees at most about two windows of text
+MAX_SENTENCE_CHARS = WINDOW_CHARS
+
+def pack_sentences(sentences, chunk_size=300, overlap=50):
+    """Yield overlapping chunks of whole sentences, at most ~chunk_size words each."""
+    current = deque()  # (sentence, word count)
+    current_len = 0
+
+    for sent in sentences:
+        sent_len = len(sent.split())
+        if current_len + sent_len > chunk_size and current:
+            yield " ".join(s for s, _ in current)
+            # Overlap: the shortest tail reaching `overlap` words (or the whole
+            # chunk if it is shorter); each sentence is dropped at most once
+            while current and current_len - current[0][1] >= overlap:
+                current_len -= current.popleft()[1]
+
+        current.append((sent, sent_len))
+        current_len += sent_len
+
+    if current: yield " ".join(s for s, _ in current)
+
+def _read_window(stream, window_chars):
+    block = stream.read(window_chars)
+    # Never cut inside a token, or the tokenizer could split it differently
+    while block and not block[-1].isspace():
+        more = stream.read(64)
+        if not more: break
+        cut = next((i for i, c in enumerate(more) if c.isspace()), None)
+        if cut is None:
+            block += more
+            continue
+        block += more[:cut + 1]
+        # Hand the overshoot back to the next read
+        return block, more[cut + 1:]
+    return block, ""
+
+def iter_sentences(stream, sentencizer, window_chars=WINDOW_CHARS, max_sentence_chars=MAX_SENTENCE_CHARS):
+    """Sentence texts from a text stream, segmented window by window."""
+    carry = ""
+    pending = ""
+    while True:
+        block, extra = _read_window(stream, window_chars)
+        block, pending = pending + block, extra
+        if not block: break
+        text = carry + block
+        sents = list(sentencizer(text).sents)
+        if len(sents) > 1:
+            for sent in sents[:-1]: yield sent.text
+            carry = text[sents[-1].start_char:]
+        elif len(text) >= max_sentence_chars:
+            # No boundary in sight: cut here instead of re-segmenting a growing carry
+            if text.strip(): yield text.strip()
+            carry = ""
+        else:
+            carry = text
+    if carry:
+        for sent in sentencizer(carry).sents: yield sent.text
+
+def iter_chunks(stream, sentencizer, chunk_size=300, overlap=50, window_chars=WINDOW_CHARS, max_sentence_chars=MAX_SENTENCE_CHARS):
+    """Streaming smart_chunk_text: yields chunks while the file is still being read."""
+    return pack_sentences(iter_sentences(stream, sentencizer, window_chars, max_sentence_chars), chunk_size, overlap)
@@ -1,46 +1,89 @@
+import time
+_IMPORT_START = time.perf_counter()
 import sys
 import json
 import subprocess
-import spacy
-import requests
+import io
 import csv
+import itertools
+import os
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from pathlib import Path
+from embed_cache import EmbeddingCache
+from embedding import PooledEncoder, encode_bucketed
+from chunker import WINDOW_CHARS, iter_chunks
+from resources import ResourceManager
+from shards import ShardedIndex
+import tracing
+from snapshots import Snapshot, SnapshotManager, atomic_write_json, current_snapshot, publish_snapshot
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 BITNET_EXEC = BASE_DIR / "models" / "llama-cli" 
 BITNET_MODEL = BASE_DIR / "models" / "ggml-model-i2_s.gguf" 
-MEMORY_FILE = BASE_DIR / "pi_memory.json"
+INDEX_DIR = BASE_DIR / "index"
 ENTITY_CACHE_FILE = BASE_DIR / "entity_cache.json"
+EMBED_CACHE_DIR = BASE_DIR / "embed_cache"
+EMBED_MODEL_NAME = 'all-MiniLM-L6-v2'
+INGEST_STREAM_BATCH = 4096  # plain-text chunks embedded per call while streaming
 
-if not BITNET_MODEL.exists():
-    print(f"WARNING: Model not found at {BITNET_MODEL}")
-    print("Please download the GGUF model and place it in the 'models/' folder.")
+# --- LAZY RESOURCES ---
+# Nothing heavy happens at import: spaCy, SentenceTransformer and the entity
+# cache are built the first time a pipeline stage asks for them.
+def load_nlp():
+    import spacy
+    print("Loading spaCy...")
+    try:
+        return spacy.load("en_core_web_sm")
+    except:
+        print("Spacy model not found. Downloading...")
+        subprocess.run([sys.executable, "-m", "spacy", "download", "en_core_web_sm"])
+        return spacy.load("en_core_web_sm")
 
-# Load Models
-print("Loading system...")
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    print("Spacy model not found. Downloading...")
-    subprocess.run([sys.executable, "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm")
+def load_sentencizer():
+    # Rule-based sentence splitting for chunking; no parser, no model download
+    import spacy
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.max_length = WINDOW_CHARS * 4
+    return nlp
 
-embed_model = SentenceTransformer('all-MiniLM-L6-v2') 
+def load_embed_model():
+    from sentence_transformers import SentenceTransformer
+    print("Loading embedding model...")
+    return SentenceTransformer(EMBED_MODEL_NAME)
 
-# --- HELPER FUNCTIONS ---
-ENTITY_CACHE = {}
-try:
-    with open(ENTITY_CACHE_FILE, 'r') as f: ENTITY_CACHE = json.load(f)
-except: pass
+def load_entity_cache():
+    with tracing.stage("load_entity_cache"):
+        try:
+            with open(ENTITY_CACHE_FILE, 'r') as f: return json.load(f)
+        except: return {}
 
+RESOURCES = ResourceManager()
+RESOURCES.register("nlp", load_nlp)
+RESOURCES.register("sentencizer", load_sentencizer)
+RESOURCES.register("embed_model", load_embed_model)
+RESOURCES.register("entity_cache", load_entity_cache)
+# Swappable backends (the benchmark installs deterministic offline ones)
+RESOURCES.register("linker", lambda: get_wikidata_id)
+RESOURCES.register("llm", lambda: run_bitnet)
+
+# --- HELPER FUNCTIONS ---
 def save_cache():
-    with open(ENTITY_CACHE_FILE, 'w') as f: json.dump(ENTITY_CACHE, f)
+    # Nothing to write if no stage ever touched the cache
+    if not RESOURCES.is_loaded("entity_cache"): return
+    atomic_write_json(ENTITY_CACHE_FILE, RESOURCES.entity_cache)
 
 def get_wikidata_id(text, context_sentence=None):
-    if text in ENTITY_CACHE: return ENTITY_CACHE[text]
+    if text in RESOURCES.entity_cache:
+        tracing.count("entity_cache_hits")
+        return RESOURCES.entity_cache[text]
+    tracing.count("entity_cache_misses")
     
+    with tracing.stage("wikidata_lookup"): return _lookup_wikidata(text, context_sentence)
+
+def _lookup_wikidata(text, context_sentence):
     try:
+        import requests
         url = "https://www.wikidata.org/w/api.php"
         # Wikidata requires a User-Agent header to allow the request
         headers = {"User-Agent": "ELERAG_Project/1.0 (contact: admin@example.com)"}
@@ -64,14 +107,14 @@ def get_wikidata_id(text, context_sentence=None):
         cand_descs = [c.get('description', c['label']) for c in candidates]
         
         # Reuse existing model to find best match
-        query_vec = embed_model.encode([query_text])[0]
-        cand_vecs = embed_model.encode(cand_descs)
+        query_vec = RESOURCES.embed_model.encode([query_text])[0]
+        cand_vecs = RESOURCES.embed_model.encode(cand_descs)
         
         scores = [cosine_sim(query_vec, cv) for cv in cand_vecs]
         best_idx = np.argmax(scores)
         best_qid = candidates[best_idx]['id']
         
-        ENTITY_CACHE[text] = best_qid
+        RESOURCES.entity_cache[text] = best_qid
         return best_qid
 
     except Exception as e:
@@ -80,7 +123,7 @@ def get_wikidata_id(text, context_sentence=None):
         return None
 
 def extract_entities(text):
-    doc = nlp(text)
+    with tracing.stage("ner"): doc = RESOURCES.nlp(text)
     entities = []
     relevant_labels = ["PERSON", "ORG", "GPE", "DATE", "LAW", "PRODUCT"]
     
@@ -90,116 +133,156 @@ def extract_entities(text):
                 entities.append(("text", ent.text.lower()))
             else:
                 # PASS THE SENTENCE CONTEXT HERE
-                qid = get_wikidata_id(ent.text, context_sentence=ent.sent.text)
+                with tracing.stage("linking"): qid = RESOURCES.linker(ent.text, context_sentence=ent.sent.text)
                 if qid: entities.append(("wiki", qid))
     return list(set(entities))
 
 def smart_chunk_text(text, chunk_size=300, overlap=50):
     """Smart Segmentation (Paper Requirement)"""
-    doc = nlp(text)
-    sentences = [sent.text for sent in doc.sents]
-    chunks = []
-    current_chunk = []
-    current_len = 0
-    
-    for sent in sentences:
-        sent_len = len(sent.split())
-        if current_len + sent_len > chunk_size and current_chunk:
-            chunks.append(" ".join(current_chunk))
-            # Create overlap
-            overlap_sents = []
-            overlap_len = 0
-            for s in reversed(current_chunk):
-                if overlap_len < overlap:
-                    overlap_sents.insert(0, s)
-                    overlap_len += len(s.split())
-                else: break
-            current_chunk = overlap_sents
-            current_len = overlap_len
-        
-        current_chunk.append(sent)
-        current_len += sent_len
-    
-    if current_chunk: chunks.append(" ".join(current_chunk))
-    return chunks
+    return list(iter_chunks(io.StringIO(text), RESOURCES.sentencizer, chunk_size, overlap))
 
 def cosine_sim(vec_a, vec_b):
     return np.dot(vec_a, vec_b) / (np.linalg.norm(vec_a) * np.linalg.norm(vec_b))
 
+def embed_texts(texts, normalize=True, cache=None, encoder=None):
+    """Encode texts, only running the model for chunks not in the embedding cache.
+
+    Callers embedding many batches pass one open cache and one PooledEncoder,
+    so keys.tsv is parsed and the worker pool started once, not per batch.
+    """
+    with tracing.stage("embed_cache_lookup"):
+        if cache is None: cache = EmbeddingCache(EMBED_CACHE_DIR)
+        keys = [EmbeddingCache.key(EMBED_MODEL_NAME, normalize, t) for t in texts]
+
+        # Identical chunks within one run share a single encode call
+        misses = {}
+        for k, t in zip(keys, texts):
+            if k not in cache and k not in misses: misses[k] = t
+    print(f"Embedding cache: {len(texts) - len(misses)}/{len(texts)} hits, encoding {len(misses)} new items...")
+    tracing.count("embed_cache_hits", len(texts) - len(misses))
+    tracing.count("embed_cache_misses", len(misses))
+
+    if misses:
+        with tracing.stage("embed_encode"):
+            if encoder is not None: new_vecs = encoder.encode(list(misses.values()), normalize=normalize)
+            else: new_vecs = encode_bucketed(RESOURCES.embed_model, list(misses.values()), normalize=normalize)
+        with tracing.stage("embed_cache_write"): cache.add(list(misses.keys()), new_vecs)
+
+    if not texts: return np.zeros((0, RESOURCES.embed_model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.stack([cache.get(k) for k in keys])
+
 # --- INGESTION ---
 def ingest_file(filepath):
+    with tracing.trace("ingest", file=str(filepath)):
+        _ingest_file(filepath)
+
+def _ingest_file(filepath):
+    with tracing.stage("embed_cache_lookup"): cache = EmbeddingCache(EMBED_CACHE_DIR)
+    with PooledEncoder(lambda: RESOURCES.embed_model) as encoder:
+        chunks, vectors = _read_and_embed(filepath, cache, encoder)
+    tracing.count("chunks", len(chunks))
+    
+    entities = [extract_entities(chunk) for chunk in chunks]
+
+    # Readers keep serving the previous snapshot until this one is published
+    with tracing.stage("publish"): snapshot = publish_snapshot(INDEX_DIR, chunks, vectors, entities)
+    with tracing.stage("save_entity_cache"): save_cache()
+    print(f"Ingestion Complete. Published index snapshot {snapshot.name}.")
+
+def _read_and_embed(filepath, cache, encoder):
     print(f"Reading {filepath}...")
     chunks = []
     if filepath.endswith('.csv'):
-        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        with tracing.stage("read"), open(filepath, 'r', encoding='utf-8', errors='replace') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 # Combine columns to ensure context isn't lost
                 text = f"[{row.get('Unit','')} - {row.get('Subtopic','')}] {row.get('Fact','')}"
                 if len(text) > 20: chunks.append(text)
+        print(f"Embedding {len(chunks)} items...")
+        vectors = embed_texts(chunks, True, cache, encoder)
     else:
-        with open(filepath, 'r') as f: 
-            content = f.read()
-            chunks = smart_chunk_text(content)
-
-    print(f"Embedding {len(chunks)} items...")
-    vectors = embed_model.encode(chunks, show_progress_bar=True, normalize_embeddings=True)
-    
-    memory_data = []
-    for i, chunk in enumerate(chunks):
-        entities = extract_entities(chunk)
-        memory_data.append({
-            "id": i, 
-            "text": chunk, 
-            "vector": vectors[i].tolist(), 
-            "entities": entities
-        })
-
-    with open(MEMORY_FILE, 'w') as f: json.dump(memory_data, f)
-    save_cache()
-    print("Ingestion Complete.")
+        # Chunks stream off the file and are embedded batch by batch
+        vectors = []
+        with open(filepath, 'r') as f:
+            stream = iter_chunks(f, RESOURCES.sentencizer)
+            while True:
+                with tracing.stage("read_and_chunk"): batch = list(itertools.islice(stream, INGEST_STREAM_BATCH))
+                if not batch: break
+                print(f"Embedding {len(batch)} items...")
+                chunks.extend(batch)
+                vectors.append(embed_texts(batch, True, cache, encoder))
+        vectors = np.concatenate(vectors) if vectors else embed_texts([], True, cache, encoder)
+    return chunks, vectors
 
 # --- RETRIEVAL & QUERY ---
-def query_system(query):
-    try:
-        with open(MEMORY_FILE, 'r') as f: memory = json.load(f)
-    except: return print("Run 'ingest' first.")
+def index_opener(shards=1):
+    """Opens a snapshot in this process, or across one worker process per shard."""
+    if shards > 1: return lambda path: ShardedIndex(path, shards)
+    return Snapshot
 
-    print("Thinking...")
-    
-    # 1. Query Expansion (Concept Search)
-    doc = nlp(query)
-    keywords = [t.text for t in doc if not t.is_stop and t.is_alpha]
+def open_index(shards=1):
+    path = current_snapshot(INDEX_DIR)
+    return index_opener(shards)(path) if path else None
+
+def query_system(query, index=None, shards=1):
+    with tracing.trace("query", query=query):
+        owns_index = index is None
+        if owns_index:
+            # Only a missing snapshot means "not ingested"; worker spawn and
+            # socket errors surface as themselves
+            with tracing.stage("load_index"): index = open_index(shards)
+            if index is None: return print("Run 'ingest' first.")
+        try: return answer_query(query, index)
+        finally:
+            if owns_index: index.close()
+
+def answer_query(query, index):
+    # Joins the caller's trace when there is one (query_system), else starts its own
+    with tracing.trace("query", query=query):
+        return _answer_query(query, index)
+
+def encode_query(query):
+    """Query Expansion (Concept Search): mean embedding of the query and its keywords."""
+    with tracing.stage("query_nlp"):
+        doc = RESOURCES.nlp(query)
+        keywords = [t.text for t in doc if not t.is_stop and t.is_alpha]
     variations = [query]
     if len(keywords) > 2: variations.append(" ".join(keywords))
     
-    query_vec = np.mean(embed_model.encode(variations, normalize_embeddings=True), axis=0)
+    with tracing.stage("query_encode"):
+        return np.mean(RESOURCES.embed_model.encode(variations, normalize_embeddings=True), axis=0)
+
+def rrf_fuse(dense_hits, entity_hits):
+    """Doc ids ranked by reciprocal rank fusion of the two legs."""
+    with tracing.stage("rrf"):
+        rrf_scores = {doc_id: 1/(60+r) for r, (doc_id, _) in enumerate(dense_hits)}
+        for r, (doc_id, _) in enumerate(entity_hits):
+            rrf_scores[doc_id] = rrf_scores.get(doc_id, 0) + 1/(60+r)
+        return sorted(rrf_scores, key=rrf_scores.get, reverse=True)
+
+def _answer_query(query, index):
+    print("Thinking...")
     
-    # 2. RRF Fusion
-    dense_hits = sorted([(d['id'], cosine_sim(query_vec, d['vector'])) for d in memory], key=lambda x:x[1], reverse=True)[:15]
-    rrf_scores = {doc_id: 1/(60+r) for r, (doc_id, _) in enumerate(dense_hits)}
+    # 1. Query Expansion (Concept Search)
+    query_vec = encode_query(query)
     
+    # 2. RRF Fusion (each leg runs inside the index, possibly across shards)
     q_ents = extract_entities(query)
-    if q_ents:
-        entity_hits = []
-        for doc in memory:
-            # JSON loads entities as lists, which breaks sets. Convert back to tuples.
-            doc_ents_set = {tuple(e) for e in doc['entities']}
-            matches = len(doc_ents_set.intersection(set(q_ents)))
-            if matches > 0: entity_hits.append((doc['id'], matches))
-        
-        for r, (doc_id, _) in enumerate(sorted(entity_hits, key=lambda x:x[1], reverse=True)[:15]):
-            rrf_scores[doc_id] = rrf_scores.get(doc_id, 0) + 1/(60+r)
+    dense_hits, entity_hits = index.search(query_vec, q_ents)
+    top_ids = rrf_fuse(dense_hits, entity_hits)[:10]
 
     # 3. Diversity Check 
-    top_ids = sorted(rrf_scores, key=rrf_scores.get, reverse=True)[:10]
-    final_ids = [top_ids[0]]
-    for cand_id in top_ids[1:]:
-        is_diverse = True
-        for sel_id in final_ids:
-            if cosine_sim(memory[cand_id]['vector'], memory[sel_id]['vector']) > 0.85:
-                is_diverse = False; break
-        if is_diverse and len(final_ids) < 3: final_ids.append(cand_id)
+    with tracing.stage("fetch"): memory = index.fetch(top_ids)
+    with tracing.stage("diversity"):
+        final_ids = [top_ids[0]]
+        for cand_id in top_ids[1:]:
+            is_diverse = True
+            for sel_id in final_ids:
+                if cosine_sim(memory[cand_id]['vector'], memory[sel_id]['vector']) > 0.85:
+                    is_diverse = False; break
+            if is_diverse and len(final_ids) < 3: final_ids.append(cand_id)
+    tracing.count("context_docs", len(final_ids))
 
     context = "\n".join([memory[i]['text'] for i in final_ids])
 
@@ -212,30 +295,87 @@ def query_system(query):
         f"### Response:"
     )
     
-    cmd = [
-        BITNET_EXEC, "-m", BITNET_MODEL, "-p", prompt,
-        "-n", "128", "-c", "2048", "--temp", "0", "-r", "###"
-    ]
+    tracing.count("prompt_chars", len(prompt))
     
     try:
-        result = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, 
-            text=True, encoding='utf-8', errors='ignore'
-        )
-        
-        full_output = result.stdout
+        with tracing.stage("generate"): full_output = RESOURCES.llm(prompt)
         if "### Response:" in full_output:
             answer = full_output.split("### Response:")[-1].strip()
+            # Whitespace tokens; llama-cli doesn't report the model's own count on stdout
+            tracing.count("generated_tokens", len(answer.split()))
             if "." in answer: answer = answer.split(".")[0] + "."
             for char in ["\n", "(", "`", "["]:
                 if char in answer: answer = answer.split(char)[0]
             print("\n--- Answer ---\n" + answer.strip() + "\n--------------\n")
+            return answer.strip()
         else:
             print(full_output)
 
     except Exception as e: print(f"Error: {e}")
 
+def run_bitnet(prompt):
+    """Default LLM backend: one llama-cli run, returning its raw stdout."""
+    if not BITNET_MODEL.exists():
+        print(f"WARNING: Model not found at {BITNET_MODEL}")
+        print("Please download the GGUF model and place it in the 'models/' folder.")
+
+    cmd = [
+        BITNET_EXEC, "-m", BITNET_MODEL, "-p", prompt,
+        "-n", "128", "-c", "2048", "--temp", "0", "-r", "###"
+    ]
+    result = subprocess.run(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, 
+        text=True, encoding='utf-8', errors='ignore'
+    )
+    return result.stdout
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+def startup_report(load_all=False):
+    """Print where startup time goes; load_all also times every model load."""
+    if load_all:
+        for name in ["entity_cache", "sentencizer", "nlp", "embed_model"]: RESOURCES.get(name)
+    print("Startup breakdown:")
+    for line in RESOURCES.report({"import elerag_improved": IMPORT_SECONDS}): print(line)
+
+def serve(shards=1):
+    """Answer one question per stdin line, picking up newly ingested snapshots as they appear."""
+    manager = SnapshotManager(INDEX_DIR, opener=index_opener(shards))
+    if manager.current is None: return print("Run 'ingest' first.")
+    print("Ready. One question per line, Ctrl-D to stop.")
+    try:
+        for line in sys.stdin:
+            if not line.strip(): continue
+            manager.maybe_reload()
+            with manager.acquire() as index: answer_query(line.strip(), index)
+    finally: manager.close()
+
+def pop_option(args, name, default):
+    if name not in args: return default
+    i = args.index(name)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+USAGE = ("Usage: python main.py [bench [--help] | ingest file.csv | query [--shards N] 'Question' | serve [--shards N] | startup [--load]]"
+         " [--timings] [--trace] [--metrics FILE] [--profile cprofile|tracemalloc]")
+
+def main(argv):
+    args = [a for a in argv if a not in ("--timings", "--trace")]
+    shards = int(pop_option(args, "--shards", 1))
+    metrics_file = pop_option(args, "--metrics", None)
+    profile = pop_option(args, "--profile", os.environ.get("ELERAG_PROFILE"))
+    # One JSON line per ingest/query on stderr, so stdout stays the answer
+    if "--trace" in argv: tracing.SINKS.append(tracing.json_printer(sys.stderr))
+    # Rewritten after every request, so a long-running serve can be scraped
+    if metrics_file: tracing.SINKS.append(lambda t: tracing.write_metrics(metrics_file))
+    with tracing.profiled(profile):
+        if len(args) > 1 and args[0] == "ingest": ingest_file(args[1])
+        elif len(args) > 0 and args[0] == "query": query_system(" ".join(args[1:]), shards=shards)
+        elif len(args) > 0 and args[0] == "serve": serve(shards)
+        elif len(args) > 0 and args[0] == "startup": startup_report(load_all="--load" in args)
+        else: print(USAGE)
+    if "--timings" in argv and (not args or args[0] != "startup"): startup_report()
+
 if __name__ == "__main__":
-    if len(sys.argv) > 2 and sys.argv[1] == "ingest": ingest_file(sys.argv[2])
-    elif len(sys.argv) > 1 and sys.argv[1] == "query": query_system(" ".join(sys.argv[2:]))
-    else: print("Usage: uv run elerag_improved.py [ingest file.csv | query 'Question']")
+    main(sys.argv[1:])
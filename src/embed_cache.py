@@ -0,0 +1,122 @@
+import os
+import fcntl
+import hashlib
+from pathlib import Path
+import numpy as np
+
+# On-disk layout (both files are append-only):
+#   vectors.f32 -> raw little-endian float32 values, one vector after another
+#   keys.tsv    -> "<key>\t<offset>\t<dim>" per vector, offset counted in floats
+# Vectors are always written before their key line, and torn tails of either
+# file are trimmed before the next append, so a crash can only leave
+# orphaned floats behind, never a key pointing at missing or misaligned data.
+# Writers take an exclusive flock on keys.tsv, so concurrent ingests are safe.
+KEY_BYTES = 20
+
+class EmbeddingCache:
+    """Content-addressed embedding store shared across re-ingests."""
+
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self.vec_file = self.dir / "vectors.f32"
+        self.key_file = self.dir / "keys.tsv"
+        self.index = {}
+        self._vectors = None
+        self._n_floats = 0
+        self._key_pos = 0  # bytes of keys.tsv already parsed into self.index
+        self._load()
+
+    @staticmethod
+    def key(model_name, normalize, text):
+        """Stable hash of (model name, normalization flag, chunk text)."""
+        h = hashlib.blake2b(digest_size=KEY_BYTES)
+        h.update(f"{model_name}\0{int(bool(normalize))}\0".encode('utf-8'))
+        h.update(text.encode('utf-8', errors='surrogatepass'))
+        return h.hexdigest()
+
+    def _load(self):
+        if not self.key_file.exists(): return
+        self._n_floats = self.vec_file.stat().st_size // 4 if self.vec_file.exists() else 0
+        with open(self.key_file, 'rb') as f: self._read_new_keys(f)
+
+    def _read_new_keys(self, f):
+        """Parse the complete key lines appended since the last call."""
+        f.seek(self._key_pos)
+        data = f.read()
+        # A torn last line is left for later; only ever trimmed back to this point
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8', errors='replace').split('\n'):
+            parts = line.split('\t')
+            if len(parts) != 3 or len(parts[0]) != KEY_BYTES * 2: continue
+            try: offset, dim = int(parts[1]), int(parts[2])
+            except ValueError: continue
+            # Skip keys whose vector never made it to disk
+            if offset + dim <= self._n_floats: self.index[parts[0]] = (offset, dim)
+        self._key_pos += end
+
+    def _mapped(self):
+        if self._vectors is None:
+            # Map whole floats only; a torn tail must not break reads
+            self._vectors = np.memmap(self.vec_file, dtype='<f4', mode='r', shape=(self._n_floats,))
+        return self._vectors
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, key):
+        loc = self.index.get(key)
+        if loc is None: return None
+        offset, dim = loc
+        return np.array(self._mapped()[offset:offset + dim], dtype=np.float32)
+
+    def add(self, keys, vectors):
+        """Append vectors for keys not already cached."""
+        vectors = np.asarray(vectors, dtype='<f4')
+        if not any(k not in self.index for k in keys): return
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.key_file, 'a+b') as kf, open(self.vec_file, 'a+b') as vf:
+            fcntl.flock(kf.fileno(), fcntl.LOCK_EX)
+            try:
+                # Drop a torn partial float left by a crashed writer
+                start = os.fstat(vf.fileno()).st_size // 4
+                vf.truncate(start * 4)
+                # Cut a torn key line so its digits can't be misread as a shorter one
+                size = kf.seek(0, os.SEEK_END)
+                if size:
+                    kf.seek(max(0, size - 256))
+                    tail = kf.read()
+                    if not tail.endswith(b'\n'):
+                        cut = tail.rfind(b'\n')
+                        kf.truncate(size - len(tail) + cut + 1)
+
+                # Catch up on keys other writers appended, reading only the new bytes
+                self._n_floats = start
+                self._read_new_keys(kf)
+                new = {}
+                for k, v in zip(keys, vectors):
+                    if k not in self.index and k not in new: new[k] = v
+                if not new: return
+
+                vf.seek(0, os.SEEK_END)
+                vf.write(np.stack(list(new.values())).tobytes())
+                vf.flush(); os.fsync(vf.fileno())
+
+                lines = []
+                offset = start
+                for k, v in new.items():
+                    lines.append(f"{k}\t{offset}\t{v.shape[0]}\n")
+                    self.index[k] = (offset, v.shape[0])
+                    offset += v.shape[0]
+                data = "".join(lines).encode('utf-8')
+                kf.write(data)
+                kf.flush()
+                self._key_pos += len(data)
+                self._n_floats = offset
+            finally:
+                fcntl.flock(kf.fileno(), fcntl.LOCK_UN)
+                # The old map does not cover the appended region
+                self._vectors = None
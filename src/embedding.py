@@ -0,0 +1,92 @@
+import os
+import time
+import numpy as np
+
+# Kept free of heavy imports: SentenceTransformer's process pool spawns workers
+# that re-import the caller, so this module must stay cheap to load.
+EMBED_TOKEN_BUDGET = 16384  # padded tokens per batch
+EMBED_MAX_BATCH = 512
+EMBED_POOL_MIN = 2000  # below this the pool's startup cost outweighs the speedup
+EMBED_WORKERS = max(2, (os.cpu_count() or 1) // 2)
+
+def plan_buckets(token_lens, token_budget=EMBED_TOKEN_BUDGET, max_batch=EMBED_MAX_BATCH):
+    """Group input indices by power-of-two token length; returns [(indices, batch_size)]."""
+    token_lens = np.asarray(token_lens)
+    bucket_ids = np.ceil(np.log2(np.maximum(token_lens, 1))).astype(int)
+    plan = []
+    for b in np.unique(bucket_ids):
+        idx = np.flatnonzero(bucket_ids == b)
+        batch_size = int(min(max_batch, max(1, token_budget // token_lens[idx].max())))
+        plan.append((idx, batch_size))
+    return plan
+
+def worth_pooling(n_texts, workers, pool_min=EMBED_POOL_MIN):
+    return n_texts >= pool_min and workers > 1 and (os.cpu_count() or 1) > 1
+
+def encode_bucketed(model, texts, normalize=True, workers=None, pool_min=EMBED_POOL_MIN, pool=None):
+    """Encode texts in length buckets with token-budgeted batch sizes, in input order.
+
+    Pass a running pool to reuse it; otherwise one is started and stopped
+    around this call when the input is large enough.
+    """
+    if not texts: return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    start = time.perf_counter()
+    workers = EMBED_WORKERS if workers is None else workers
+
+    # Short CSV facts never pad up to the length of long emails
+    enc = model.tokenizer(texts, truncation=True, max_length=model.max_seq_length)
+    plan = plan_buckets([len(ids) for ids in enc['input_ids']])
+
+    owns_pool = pool is None and worth_pooling(len(texts), workers, pool_min)
+    if owns_pool: pool = model.start_multi_process_pool(["cpu"] * workers)
+
+    out = None
+    try:
+        for idx, batch_size in plan:
+            bucket = [texts[i] for i in idx]
+            if pool:
+                # Hand each worker whole batches rather than the default small chunks
+                per_worker = -(-len(bucket) // (workers * 4))
+                chunk_size = batch_size * max(1, -(-per_worker // batch_size))
+                vecs = model.encode(bucket, batch_size=batch_size, normalize_embeddings=normalize, pool=pool, chunk_size=chunk_size)
+            else:
+                vecs = model.encode(bucket, batch_size=batch_size, normalize_embeddings=normalize, show_progress_bar=False)
+            if out is None: out = np.zeros((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+    finally:
+        if owns_pool and pool: model.stop_multi_process_pool(pool)
+
+    elapsed = time.perf_counter() - start
+    mode = f"{workers} processes" if pool else "1 process"
+    print(f"Encoded {len(texts)} chunks in {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} chunks/sec, {mode})")
+    return out
+
+class PooledEncoder:
+    """encode_bucketed across many calls (e.g. streamed batches) sharing one process pool.
+
+    get_model is only called on the first encode, so a fully cached ingest
+    never loads the model; the pool starts with the first call large enough
+    to be worth it and runs until close().
+    """
+
+    def __init__(self, get_model, workers=None, pool_min=EMBED_POOL_MIN):
+        self.get_model = get_model
+        self.workers = EMBED_WORKERS if workers is None else workers
+        self.pool_min = pool_min
+        self.model = self.pool = None
+
+    def encode(self, texts, normalize=True):
+        if self.model is None: self.model = self.get_model()
+        if self.pool is None and worth_pooling(len(texts), self.workers, self.pool_min):
+            self.pool = self.model.start_multi_process_pool(["cpu"] * self.workers)
+        return encode_bucketed(self.model, texts, normalize, self.workers, self.pool_min, pool=self.pool)
+
+    def close(self):
+        if self.pool: self.model.stop_multi_process_pool(self.pool)
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
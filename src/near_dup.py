@@ -0,0 +1,114 @@
+import zlib
+import hashlib
+import numpy as np
+
+# MinHash over word shingles with banded LSH. Everything is seeded and built
+# on crc32/blake2b, so signatures are identical across runs and processes
+# (unlike the salted built-in hash()).
+NEAR_DUP_THRESHOLD = 0.8  # estimated Jaccard at which two texts count as the same
+SHINGLE_SIZE = 5
+NUM_PERMS = 128
+NUM_BANDS = 32
+_PRIME = (1 << 31) - 1
+_MIX = np.uint64(0x9E3779B97F4A7C15)  # 64-bit golden ratio, for band hashing
+
+def exact_digest(text):
+    return hashlib.blake2b(text.encode('utf-8', errors='surrogatepass'), digest_size=16).digest()
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = text.lower().split()
+    if len(words) <= size: return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class NearDupFilter:
+    """Streaming near-duplicate detector: feed texts in order, keep the first of each cluster.
+
+    State per kept text is its uint32 signature plus one (uint64 band hash,
+    int32 doc) slot per band in a flat open-addressing table: 1.3 to 2.6 KB
+    at the defaults, depending on how full the doubling arrays are. Band hashes may collide; candidates are always confirmed
+    against the full signature.
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, num_perms=NUM_PERMS, num_bands=NUM_BANDS, seed=1):
+        if num_perms % num_bands: raise ValueError("num_perms must be a multiple of num_bands")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=num_perms, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perms, dtype=np.uint64)
+        self.threshold = threshold
+        self.rows = num_perms // num_bands
+        self.num_bands = num_bands
+        self._sigs = np.zeros((0, num_perms), dtype=np.uint32)
+        self._n = 0
+        # Band table: key 0 marks an empty slot, capacity is a power of two
+        self._keys = np.zeros(1024, dtype=np.uint64)
+        self._vals = np.zeros(1024, dtype=np.int32)
+        self._used = 0
+
+    def __len__(self):
+        return self._n
+
+    def signature(self, text):
+        x = np.fromiter((zlib.crc32(s.encode('utf-8', errors='surrogatepass')) % _PRIME for s in shingles(text)), dtype=np.uint64)
+        # a, b, x < 2^31, so a * x + b cannot overflow uint64; the minimum fits uint32
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def band_keys(self, sig):
+        """One 64-bit hash per band, mixing in the band number so bands never share keys."""
+        h = np.arange(1, self.num_bands + 1, dtype=np.uint64) * _MIX
+        for col in sig.reshape(self.num_bands, self.rows).T.astype(np.uint64):
+            h = (h ^ col) * _MIX  # wraps mod 2^64
+        return h | np.uint64(1)
+
+    def _slot(self, key):
+        # High bits of the hash; the low bits of a product mix poorly
+        return key >> (64 - (len(self._keys).bit_length() - 1))
+
+    def _candidates(self, keys):
+        table, vals, mask = self._keys, self._vals, len(self._keys) - 1
+        found = set()
+        for key in keys:
+            slot = self._slot(key)
+            while (k := int(table[slot])) != 0:
+                if k == key: found.add(int(vals[slot]))
+                slot = (slot + 1) & mask
+        return found
+
+    def _insert(self, keys, vals):
+        table, mask = self._keys, len(self._keys) - 1
+        for key, val in zip(keys, vals):
+            slot = self._slot(key)
+            while table[slot] != 0: slot = (slot + 1) & mask  # linear probing
+            table[slot] = key
+            self._vals[slot] = val
+        self._used += len(keys)
+
+    def _grow(self):
+        old_keys, old_vals = self._keys, self._vals
+        self._keys = np.zeros(len(old_keys) * 2, dtype=np.uint64)
+        self._vals = np.zeros(len(old_vals) * 2, dtype=np.int32)
+        self._used = 0
+        # Rehash in slices so the Python ints never outnumber one slice
+        for i in range(0, len(old_keys), 1 << 16):
+            full = np.flatnonzero(old_keys[i:i + (1 << 16)]) + i
+            self._insert(old_keys[full].tolist(), old_vals[full].tolist())
+
+    def check(self, text):
+        """Returns the index of an earlier kept text this one duplicates, or None (and keeps it)."""
+        sig = self.signature(text)
+        keys = self.band_keys(sig).tolist()
+        cands = sorted(self._candidates(keys))
+        if cands:
+            agree = (self._sigs[cands] == sig).mean(axis=1)
+            hits = np.flatnonzero(agree >= self.threshold)
+            if len(hits): return cands[hits[0]]
+
+        idx = self._n
+        if idx == len(self._sigs):
+            grown = np.zeros((max(1024, 2 * idx), self._sigs.shape[1]), dtype=np.uint32)
+            grown[:idx] = self._sigs
+            self._sigs = grown
+        self._sigs[idx] = sig
+        self._n += 1
+        while (self._used + len(keys)) * 2 > len(self._keys): self._grow()
+        self._insert(keys, [idx] * len(keys))
+        return None
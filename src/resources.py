@@ -0,0 +1,43 @@
+import time
+
+class ResourceManager:
+    """Builds heavy resources on first access and records how long each took.
+
+    Loaders are registered by name and read back as attributes, e.g.
+    RESOURCES.nlp(text), so a command only pays for what it touches.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._items = {}
+        self.timings = {}
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+
+    def __getattr__(self, name):
+        # Only called for names that aren't real attributes
+        if name.startswith('_'): raise AttributeError(name)
+        return self.get(name)
+
+    def get(self, name):
+        if name not in self._items:
+            if name not in self._loaders: raise AttributeError(f"No resource named '{name}'")
+            start = time.perf_counter()
+            self._items[name] = self._loaders[name]()
+            self.timings[name] = time.perf_counter() - start
+        return self._items[name]
+
+    def set(self, name, value):
+        """Install a ready-made resource (tests, benchmarks, alternative backends)."""
+        self._items[name] = value
+
+    def is_loaded(self, name):
+        return name in self._items
+
+    def report(self, extra=None):
+        """Startup breakdown as printable lines; extra is a dict of other timed steps."""
+        rows = list((extra or {}).items()) + [(f"load {k}", v) for k, v in self.timings.items()]
+        lines = [f"  {name:<24}{secs * 1000:9.1f} ms" for name, secs in rows]
+        lines.append(f"  {'total':<24}{sum(v for _, v in rows) * 1000:9.1f} ms")
+        return lines
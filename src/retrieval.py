@@ -0,0 +1,25 @@
+import numpy as np
+
+# Candidates each retrieval leg feeds into RRF
+DENSE_K = 15
+ENTITY_K = 15
+
+def top_k(hits, k):
+    """Best k (id, score) pairs; ties go to the lower id, like a stable sort over memory order."""
+    return sorted(hits, key=lambda h: (-h[1], h[0]))[:k]
+
+def dense_search(matrix, norms, ids, query_vec, k):
+    """Exact cosine top-k over the rows of matrix."""
+    if len(ids) == 0: return []
+    # einsum reduces each row on its own; BLAS matmul can round a row differently
+    # depending on how many rows sit next to it, which would break shard/single parity
+    query_vec = np.asarray(query_vec, dtype=np.float64)
+    scores = np.einsum('ij,j->i', matrix, query_vec, dtype=np.float64) / (norms * np.linalg.norm(query_vec))
+    if len(scores) > k:
+        # Partition first, then keep everything tied with the k-th score so the
+        # id tie-break stays exact
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(len(scores))
+    return top_k([(int(ids[i]), float(scores[i])) for i in cand], k)
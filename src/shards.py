@@ -0,0 +1,97 @@
+import os
+import json
+import bisect
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+import tracing
+from retrieval import DENSE_K, ENTITY_K, top_k
+from snapshots import Snapshot
+
+# Each shard is a contiguous id range of one snapshot, mapped and served by
+# its own process over a local socket. The coordinator sends every query to
+# all shards at once, then merges the per-shard top-k lists; since every shard
+# ranks with the same exact scoring and id tie-break, the merge equals a
+# single-index search.
+
+def shard_bounds(n_docs, n_shards):
+    """Start offsets of each contiguous shard."""
+    if n_docs == 0: return [0]
+    n_shards = max(1, min(n_shards, n_docs))
+    size = -(-n_docs // n_shards)
+    return list(range(0, n_docs, size))
+
+def serve_shard(path, start, end, authkey, ready):
+    """Worker process: map one slice of a snapshot and answer search/fetch requests."""
+    index = Snapshot(path, start, end)
+    with Listener(('127.0.0.1', 0), authkey=authkey) as listener:
+        ready.send(listener.address)
+        ready.close()
+        with listener.accept() as conn:
+            while True:
+                try: msg = conn.recv()
+                except EOFError: break
+                if msg[0] == "search": conn.send(index.search(*msg[1:]))
+                elif msg[0] == "fetch": conn.send(index.fetch(msg[1]))
+                else: break
+    index.close()
+
+class ShardedIndex:
+    """Scatter-gather coordinator with the same search/fetch interface as Snapshot."""
+
+    def __init__(self, snapshot_path, n_shards):
+        with open(Path(snapshot_path) / "meta.json", 'r') as f: count = json.load(f)["count"]
+        self.count = count
+        self.bounds = shard_bounds(count, n_shards)
+        ends = self.bounds[1:] + [count]
+        authkey = os.urandom(16)
+        ctx = mp.get_context("spawn")
+        self.procs, self.conns = [], []
+        pipes = []
+        # Start every worker before waiting on any, so shards load in parallel
+        for start, end in zip(self.bounds, ends):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=serve_shard, args=(str(snapshot_path), start, end, authkey, child), daemon=True)
+            proc.start()
+            self.procs.append(proc)
+            pipes.append(parent)
+        for parent in pipes:
+            self.conns.append(Client(parent.recv(), authkey=authkey))
+            parent.close()
+        print(f"Serving {len(self.conns)} shards.")
+
+    def search(self, query_vec, q_ents, dense_k=DENSE_K, entity_k=ENTITY_K):
+        # Workers don't trace; the coordinator records the whole round trip
+        with tracing.stage("scatter_gather"):
+            for conn in self.conns: conn.send(("search", query_vec, q_ents, dense_k, entity_k))
+            parts = [conn.recv() for conn in self.conns]
+            dense = top_k([h for d, _ in parts for h in d], dense_k)
+            entity = top_k([h for _, e in parts for h in e], entity_k)
+        tracing.count("candidates_scored", self.count)
+        return dense, entity
+
+    def __len__(self):
+        return self.count
+
+    def fetch(self, ids):
+        by_shard = {}
+        for i in ids: by_shard.setdefault(bisect.bisect_right(self.bounds, i) - 1, []).append(i)
+        for s, shard_ids in by_shard.items(): self.conns[s].send(("fetch", shard_ids))
+        out = {}
+        for s in by_shard: out.update(self.conns[s].recv())
+        return out
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(("close",))
+                conn.close()
+            except OSError: pass
+        for proc in self.procs: proc.join(timeout=5)
+        self.conns, self.procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import bisect
+import mmap
+import shutil
+import threading
+import contextlib
+from collections import Counter
+from pathlib import Path
+import numpy as np
+import tracing
+from retrieval import DENSE_K, ENTITY_K, dense_search, top_k
+
+# Layout under the index directory:
+#   v000007/        one immutable snapshot per ingest
+#     vectors.npy   float32 (n, dim), opened with mmap
+#     norms.npy     float64 row norms, so every view scores rows identically
+#     docs.jsonl    {"text", "entities"} per line, located through offsets.npy
+#     entity_keys.bin + entity_key_offsets.npy
+#                   sorted UTF-8 "kind\tvalue" keys, found by binary search
+#     postings.npy + posting_offsets.npy
+#                   ascending doc ids of each key (inverted index)
+#     meta.json     version, count, dim
+#   CURRENT         name of the published snapshot
+# A snapshot is built in a hidden temp dir and renamed into place, then
+# CURRENT is swapped with os.replace, so readers only ever see complete data.
+KEEP_SNAPSHOTS = 3
+SNAPSHOT_RE = re.compile(r"^v(\d{6})$")
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+def atomic_write_json(path, obj):
+    """Replace path in one step; readers see the old file or the new one, never half."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(obj, f)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def entity_key(ent):
+    return f"{ent[0]}\t{ent[1]}"
+
+def list_versions(index_dir):
+    index_dir = Path(index_dir)
+    if not index_dir.exists(): return []
+    return sorted(int(m.group(1)) for m in (SNAPSHOT_RE.match(p.name) for p in index_dir.iterdir()) if m)
+
+def current_snapshot(index_dir):
+    """Path of the published snapshot, or None before the first ingest."""
+    try: name = (Path(index_dir) / "CURRENT").read_text().strip()
+    except OSError: return None
+    return Path(index_dir) / name if SNAPSHOT_RE.match(name) else None
+
+def publish_snapshot(index_dir, texts, vectors, entities):
+    """Write a new snapshot next to the live one and atomically make it current."""
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tmp = index_dir / f".tmp-{os.getpid()}-{os.urandom(4).hex()}"
+    tmp.mkdir()
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    np.save(tmp / "vectors.npy", vectors)
+    np.save(tmp / "norms.npy", np.linalg.norm(vectors.astype(np.float64), axis=1))
+
+    offsets = [0]
+    postings = {}
+    with open(tmp / "docs.jsonl", 'wb') as f:
+        for i, (text, ents) in enumerate(zip(texts, entities)):
+            line = (json.dumps({"text": text, "entities": ents}) + "\n").encode('utf-8')
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+            for e in set(map(tuple, ents)): postings.setdefault(entity_key(e), []).append(i)
+        f.flush(); os.fsync(f.fileno())
+    np.save(tmp / "offsets.npy", np.array(offsets, dtype=np.int64))
+    # Everything a reader needs is an mmappable array, so opening a snapshot
+    # parses nothing and each shard just binary-searches its id range
+    keys = sorted(k.encode('utf-8') for k in postings)
+    with open(tmp / "entity_keys.bin", 'wb') as f: f.write(b"".join(keys))
+    np.save(tmp / "entity_key_offsets.npy", np.cumsum([0] + [len(k) for k in keys], dtype=np.int64))
+    lists = [postings[k.decode('utf-8')] for k in keys]
+    np.save(tmp / "postings.npy", np.fromiter((i for ids in lists for i in ids), dtype=np.int64, count=sum(map(len, lists))))
+    np.save(tmp / "posting_offsets.npy", np.cumsum([0] + [len(ids) for ids in lists], dtype=np.int64))
+
+    # Claim the next version number; a concurrent ingest that got there first
+    # makes the rename fail and we move on to the one after
+    version = (list_versions(index_dir) or [0])[-1] + 1
+    while True:
+        with open(tmp / "meta.json", 'w') as f:
+            json.dump({"version": version, "count": len(texts), "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0}, f)
+        for p in tmp.iterdir():
+            with open(p, 'rb') as f: os.fsync(f.fileno())
+        _fsync_dir(tmp)
+        final = index_dir / f"v{version:06d}"
+        try:
+            os.rename(tmp, final)
+            break
+        except OSError:
+            if not final.exists(): raise
+            version += 1
+
+    current = current_snapshot(index_dir)
+    if current is None or int(current.name[1:]) < version:
+        tmp_current = index_dir / f".CURRENT.{os.getpid()}.tmp"
+        tmp_current.write_text(final.name + "\n")
+        os.replace(tmp_current, index_dir / "CURRENT")
+        _fsync_dir(index_dir)
+
+    # Old snapshots can go even if a reader still maps them; the OS keeps
+    # unlinked files alive until the last map is closed
+    for v in list_versions(index_dir)[:-KEEP_SNAPSHOTS]:
+        shutil.rmtree(index_dir / f"v{v:06d}", ignore_errors=True)
+    return final
+
+class KeyTable:
+    """Sorted byte keys stored back to back; indexable, so bisect works on it directly."""
+
+    def __init__(self, blob, offsets):
+        self.blob, self.offsets = blob, offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def find(self, key):
+        i = bisect.bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else None
+
+def _map_file(f):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+class Snapshot:
+    """Read-only mmapped view of one snapshot, optionally limited to ids [start, end)."""
+
+    def __init__(self, path, start=0, end=None):
+        self.path = Path(path)
+        with open(self.path / "meta.json", 'r') as f: self.meta = json.load(f)
+        count = self.meta["count"]
+        self.start, self.end = start, count if end is None else min(end, count)
+        self.ids = range(self.start, self.end)
+        if count:
+            self.vectors = np.load(self.path / "vectors.npy", mmap_mode='r')[self.start:self.end]
+            self.norms = np.load(self.path / "norms.npy", mmap_mode='r')[self.start:self.end]
+        else:
+            self.vectors, self.norms = np.zeros((0, 0), dtype=np.float32), np.zeros(0)
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode='r')
+        self._docs_file = open(self.path / "docs.jsonl", 'rb')
+        self._docs = _map_file(self._docs_file)
+        self._keys_file = open(self.path / "entity_keys.bin", 'rb')
+        self._keys_blob = _map_file(self._keys_file)
+        self.keys = KeyTable(self._keys_blob, np.load(self.path / "entity_key_offsets.npy", mmap_mode='r'))
+        self.postings = np.load(self.path / "postings.npy", mmap_mode='r')
+        self.posting_offsets = np.load(self.path / "posting_offsets.npy", mmap_mode='r')
+
+    def entity_ids(self, ent):
+        """Ids in this slice whose entities include ent."""
+        k = self.keys.find(entity_key(ent).encode('utf-8'))
+        if k is None: return self.postings[:0]
+        ids = self.postings[self.posting_offsets[k]:self.posting_offsets[k + 1]]
+        lo, hi = np.searchsorted(ids, [self.start, self.end])
+        return ids[lo:hi]
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def search(self, query_vec, q_ents, dense_k=DENSE_K, entity_k=ENTITY_K):
+        """Returns (dense_hits, entity_hits) as ranked (id, score) lists."""
+        with tracing.stage("dense_scoring"):
+            dense = dense_search(self.vectors, self.norms, self.ids, query_vec, dense_k)
+        tracing.count("candidates_scored", len(self))
+        with tracing.stage("entity_scoring"):
+            counts = Counter()
+            for e in set(q_ents):
+                for i in self.entity_ids(e).tolist(): counts[i] += 1
+            entity = top_k(counts.items(), entity_k)
+        tracing.count("entity_candidates", len(counts))
+        return dense, entity
+
+    def doc(self, i):
+        return json.loads(self._docs[self.offsets[i]:self.offsets[i + 1]])
+
+    def fetch(self, ids):
+        """Text, entities and vector for each requested id."""
+        out = {}
+        for i in ids:
+            d = self.doc(i)
+            d["id"] = i
+            d["vector"] = np.array(self.vectors[i - self.start])
+            out[i] = d
+        return out
+
+    def close(self):
+        # Drop every reference into the maps before closing them
+        self.vectors = self.norms = self.offsets = self.postings = self.posting_offsets = self.keys = None
+        for blob, f in [(self._docs, self._docs_file), (self._keys_blob, self._keys_file)]:
+            if isinstance(blob, mmap.mmap): blob.close()
+            f.close()
+
+class SnapshotManager:
+    """Serves the current snapshot and hot-swaps newer ones between queries.
+
+    Queries hold a reference through acquire(); a replaced index is closed
+    once its last in-flight query finishes, so at most one extra set of maps
+    is ever open. Snapshots hold no parsed copies of their files (vectors,
+    docs and postings are all mmapped), so nothing is copied into RAM twice.
+    """
+
+    def __init__(self, index_dir, opener=Snapshot):
+        self.index_dir = Path(index_dir)
+        self.opener = opener
+        self.current = None
+        self.current_path = None
+        self._refs = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+        self.maybe_reload()
+
+    def maybe_reload(self):
+        """Open the published snapshot if it changed; returns True on a swap."""
+        path = current_snapshot(self.index_dir)
+        if path is None or path == self.current_path: return False
+        new = self.opener(path)
+        with self._lock:
+            old, self.current, self.current_path = self.current, new, path
+            self._refs[id(new)] = 0
+            if old is not None: self._retire(old)
+        print(f"Loaded index snapshot {path.name}.")
+        return True
+
+    def _retire(self, index):
+        # Caller holds the lock
+        if self._refs.get(id(index), 0) == 0:
+            self._refs.pop(id(index), None)
+            index.close()
+        else:
+            self._retired.add(index)
+
+    @contextlib.contextmanager
+    def acquire(self):
+        with self._lock:
+            index = self.current
+            if index is None: raise RuntimeError("No index snapshot published yet")
+            self._refs[id(index)] += 1
+        try: yield index
+        finally:
+            with self._lock:
+                self._refs[id(index)] -= 1
+                if index in self._retired and self._refs[id(index)] == 0:
+                    self._retired.discard(index)
+                    self._refs.pop(id(index))
+                    index.close()
+
+    def close(self):
+        with self._lock:
+            if self.current is not None: self._retire(self.current)
+            self.current = self.current_path = None
@@ -0,0 +1,165 @@
+import io
+import os
+import time
+import json
+import pstats
+import cProfile
+import tracemalloc
+import threading
+import contextlib
+import contextvars
+
+# One Trace per ingest or query. Code anywhere below the entry point records
+# into whatever trace is active through stage()/count(), so helpers such as
+# the Wikidata lookup don't need a trace argument. With no active trace both
+# are no-ops.
+_current = contextvars.ContextVar("elerag_trace", default=None)
+
+class Trace:
+    """Stage timings (seconds) and counters for one request."""
+
+    def __init__(self, kind, **attrs):
+        self.kind = kind
+        self.attrs = attrs
+        self.stages = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.total = None
+
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        total = self.total if self.total is not None else time.perf_counter() - self.start
+        return {
+            "kind": self.kind,
+            **self.attrs,
+            "total_ms": round(total * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+class Metrics:
+    """Cumulative totals across finished traces, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.request_seconds = {}
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.events = {}
+
+    def observe(self, trace):
+        with self._lock:
+            self.requests[trace.kind] = self.requests.get(trace.kind, 0) + 1
+            self.request_seconds[trace.kind] = self.request_seconds.get(trace.kind, 0.0) + trace.total
+            for name, secs in trace.stages.items():
+                key = (trace.kind, name)
+                self.stage_seconds[key] = self.stage_seconds.get(key, 0.0) + secs
+                self.stage_calls[key] = self.stage_calls.get(key, 0) + 1
+            for name, n in trace.counters.items():
+                key = (trace.kind, name)
+                self.events[key] = self.events.get(key, 0) + n
+
+    def render(self):
+        with self._lock:
+            lines = []
+            def family(name, help_text, samples):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(samples.items()):
+                    label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_str}}} {value:g}" if isinstance(value, float) else f"{name}{{{label_str}}} {value}")
+            family("elerag_requests_total", "Finished ingests and queries.",
+                   {(("kind", k),): v for k, v in self.requests.items()})
+            family("elerag_request_seconds_total", "Wall time spent in finished requests.",
+                   {(("kind", k),): v for k, v in self.request_seconds.items()})
+            family("elerag_stage_seconds_total", "Wall time spent per pipeline stage.",
+                   {(("kind", k), ("stage", s)): v for (k, s), v in self.stage_seconds.items()})
+            family("elerag_stage_requests_total", "Requests that ran each pipeline stage.",
+                   {(("kind", k), ("stage", s)): v for (k, s), v in self.stage_calls.items()})
+            family("elerag_events_total", "Pipeline counters (cache hits, candidates scored, tokens, ...).",
+                   {(("kind", k), ("name", n)): v for (k, n), v in self.events.items()})
+            return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+# Callables receiving every finished Trace (CLI printing, benchmark collection)
+SINKS = []
+
+@contextlib.contextmanager
+def trace(kind, **attrs):
+    """Start a trace, or join the active one so an outer entry point owns it."""
+    active = _current.get()
+    if active is not None:
+        yield active
+        return
+    t = Trace(kind, **attrs)
+    token = _current.set(t)
+    try: yield t
+    finally:
+        _current.reset(token)
+        t.total = time.perf_counter() - t.start
+        METRICS.observe(t)
+        for sink in SINKS: sink(t)
+
+@contextlib.contextmanager
+def stage(name):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    start = time.perf_counter()
+    try: yield
+    finally: t.add_time(name, time.perf_counter() - start)
+
+def count(name, n=1):
+    t = _current.get()
+    if t is not None: t.count(name, n)
+
+def current():
+    return _current.get()
+
+@contextlib.contextmanager
+def profiled(mode, out_prefix="elerag_profile", top=25):
+    """Opt-in deep dive: mode is 'cprofile', 'tracemalloc' or None."""
+    if not mode:
+        yield
+        return
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try: yield
+        finally:
+            prof.disable()
+            path = f"{out_prefix}.pstats"
+            prof.dump_stats(path)
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top)
+            print(buf.getvalue())
+            print(f"cProfile stats written to {path} (open with: python -m pstats {path})")
+    elif mode == "tracemalloc":
+        tracemalloc.start(25)
+        try: yield
+        finally:
+            snap = tracemalloc.take_snapshot()
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"tracemalloc: current {current_bytes / 1e6:.1f} MB, peak {peak_bytes / 1e6:.1f} MB")
+            for stat in snap.statistics("lineno")[:top]: print(f"  {stat}")
+    else:
+        raise ValueError(f"Unknown profile mode '{mode}' (use cprofile or tracemalloc)")
+
+def json_printer(stream=None):
+    """Sink that prints each trace as one JSON line."""
+    def sink(t):
+        print(json.dumps(t.to_dict()), file=stream, flush=True)
+    return sink
+
+def write_metrics(path):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f: f.write(METRICS.render())
+    os.replace(tmp, path)
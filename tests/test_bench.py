@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import bench
+import elerag_improved as elerag
+
+def test_fake_embedder_is_deterministic():
+    texts = ["Amazon river forest", "Apple server patent", ""]
+    a = bench.FakeEmbedder().encode(texts, normalize_embeddings=True)
+    b = bench.FakeEmbedder().encode(texts, normalize_embeddings=True)
+    np.testing.assert_array_equal(a, b)
+    np.testing.assert_allclose(np.linalg.norm(a, axis=1), 1.0, rtol=1e-6)
+
+def test_run_reports_every_metric(tmp_path, monkeypatch):
+    # run() repoints the pipeline at a temp dir and installs fakes; undo both afterwards
+    for name in ["INDEX_DIR", "ENTITY_CACHE_FILE", "EMBED_CACHE_DIR"]:
+        monkeypatch.setattr(elerag, name, getattr(elerag, name))
+    monkeypatch.setattr(elerag, "RESOURCES", elerag.RESOURCES.__class__())
+    for name, loader in [("entity_cache", dict), ("linker", lambda: None), ("llm", lambda: None)]:
+        elerag.RESOURCES.register(name, loader)
+
+    first = bench.run(rows=300, queries=10, seed=3, workdir=tmp_path)
+    second = bench.run(rows=300, queries=10, seed=3, workdir=tmp_path)
+    assert first["ingest"]["chunks"] == 300 and first["ingest"]["chunks_per_sec"] > 0
+    assert set(first["query"]["latency_ms"]) == {"p50", "p95", "p99", "mean"}
+    assert first["query"]["answered"] == 10
+    assert first["memory"]["peak_rss_bytes"] > 0
+    # Per-stage breakdown from the traces: one ingest, one trace per timed query
+    assert {"read", "publish"} <= set(first["ingest"]["stages"]["mean_ms"])
+    assert {"query_encode", "dense_scoring", "rrf", "generate"} <= set(first["query"]["stages"]["mean_ms"])
+    assert first["query"]["stages"]["counters"]["candidates_scored"] == 300 * 10
+    # Same seed, same fakes: identical index on disk
+    assert first["index"] == second["index"]
+
+def test_shard_sweep_reports_speedup(tmp_path, monkeypatch):
+    for name in ["INDEX_DIR", "ENTITY_CACHE_FILE", "EMBED_CACHE_DIR"]:
+        monkeypatch.setattr(elerag, name, getattr(elerag, name))
+    monkeypatch.setattr(elerag, "RESOURCES", elerag.RESOURCES.__class__())
+    for name, loader in [("entity_cache", dict), ("linker", lambda: None), ("llm", lambda: None)]:
+        elerag.RESOURCES.register(name, loader)
+
+    results = bench.run(rows=200, queries=5, seed=1, workdir=tmp_path, shard_sweep=(1, 2))
+    assert [s["shards"] for s in results["shard_scaling"]] == [1, 2]
+    assert results["shard_scaling"][0]["speedup"] == 1.0
+
+def test_streaming_ingest_opens_cache_and_pool_once(tmp_path, monkeypatch):
+    import embed_cache
+    import embedding
+    spacy = pytest.importorskip("spacy")
+    for name, value in [("INDEX_DIR", tmp_path / "index"), ("ENTITY_CACHE_FILE", tmp_path / "ec.json"),
+                        ("EMBED_CACHE_DIR", tmp_path / "emb"), ("INGEST_STREAM_BATCH", 7)]:
+        monkeypatch.setattr(elerag, name, value)
+    monkeypatch.setattr(elerag, "RESOURCES", elerag.RESOURCES.__class__())
+    elerag.RESOURCES.register("entity_cache", dict)
+    bench.install_fakes()
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    elerag.RESOURCES.set("sentencizer", nlp)
+
+    opened, pools = [], []
+    class CountingCache(embed_cache.EmbeddingCache):
+        def __init__(self, *args):
+            opened.append(1)
+            super().__init__(*args)
+    monkeypatch.setattr(elerag, "EmbeddingCache", CountingCache)
+    monkeypatch.setattr(embedding, "worth_pooling", lambda n, workers, pool_min=0: True)
+    monkeypatch.setattr(bench.FakeEmbedder, "start_multi_process_pool", lambda self, devices: pools.append(1) or "pool")
+    monkeypatch.setattr(bench.FakeEmbedder, "encode", lambda self, texts, normalize_embeddings=False, **kw:
+                        np.ones((len(texts), bench.FAKE_DIM), dtype=np.float32))
+
+    doc = tmp_path / "doc.txt"
+    doc.write_text(" ".join(f"Sentence number {i} is here." for i in range(2000)))
+    elerag.ingest_file(str(doc))
+    snapshot = elerag.Snapshot(elerag.current_snapshot(elerag.INDEX_DIR))
+    assert len(snapshot) > 7  # several streamed batches
+    snapshot.close()
+    assert opened == [1] and pools == [1]
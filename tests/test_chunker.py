@@ -0,0 +1,83 @@
+import io
+import random
+import pytest
+from chunker import iter_chunks, iter_sentences, pack_sentences
+
+def reference_chunks(sentences, chunk_size=300, overlap=50):
+    # The original smart_chunk_text packing, kept verbatim as the oracle
+    chunks = []
+    current_chunk = []
+    current_len = 0
+    for sent in sentences:
+        sent_len = len(sent.split())
+        if current_len + sent_len > chunk_size and current_chunk:
+            chunks.append(" ".join(current_chunk))
+            overlap_sents = []
+            overlap_len = 0
+            for s in reversed(current_chunk):
+                if overlap_len < overlap:
+                    overlap_sents.insert(0, s)
+                    overlap_len += len(s.split())
+                else: break
+            current_chunk = overlap_sents
+            current_len = overlap_len
+        current_chunk.append(sent)
+        current_len += sent_len
+    if current_chunk: chunks.append(" ".join(current_chunk))
+    return chunks
+
+WORDS = ["alpha", "Beta", "gamma.", "delta!", "eps?", "zeta", "\n\n", "Mr.", "U.S.", "3.5", "end.\n", "  ", "x"]
+
+def random_sentences(rng, n):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.choice([0, 1, 3, 8, 20, 60]))) for _ in range(n)]
+
+@pytest.mark.parametrize("chunk_size,overlap", [(300, 50), (40, 10), (10, 0), (5, 30), (1, 1)])
+def test_packing_matches_original(chunk_size, overlap):
+    rng = random.Random(chunk_size * 100 + overlap)
+    for _ in range(50):
+        sents = random_sentences(rng, rng.randint(0, 80))
+        assert list(pack_sentences(sents, chunk_size, overlap)) == reference_chunks(sents, chunk_size, overlap)
+
+@pytest.fixture(scope="module")
+def sentencizer():
+    spacy = pytest.importorskip("spacy")
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+def test_windows_match_whole_text(sentencizer):
+    rng = random.Random(7)
+    for _ in range(100):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 400)))
+        whole = [s.text for s in sentencizer(text).sents] if text else []
+        for window in (5, 17, 64, 1000):
+            assert list(iter_sentences(io.StringIO(text), sentencizer, window)) == whole
+
+def test_streamed_chunks_match_original_boundaries(sentencizer):
+    rng = random.Random(11)
+    text = " ".join(rng.choice(WORDS) for _ in range(5000))
+    whole = [s.text for s in sentencizer(text).sents]
+    streamed = list(iter_chunks(io.StringIO(text), sentencizer, chunk_size=120, overlap=20, window_chars=300))
+    assert streamed == reference_chunks(whole, 120, 20)
+    assert len(streamed) > 10
+
+def test_unpunctuated_input_stays_bounded(sentencizer):
+    from chunker import WINDOW_CHARS
+    seen = []
+    def recording(text):
+        seen.append(len(text))
+        return sentencizer(text)
+    # Same limit load_sentencizer sets; the whole-text baseline would need 950k
+    sentencizer.max_length = WINDOW_CHARS * 4
+    text = "word " * 190_000
+    chunks = list(iter_chunks(io.StringIO(text), recording, chunk_size=300, overlap=50))
+    assert max(seen) < 2 * WINDOW_CHARS + 128
+    # Nothing is lost: every word lands in some chunk, overlaps aside
+    assert sum(len(c.split()) for c in chunks) >= 190_000
+
+def test_long_sentences_are_cut_at_the_cap(sentencizer):
+    text = ("lorem ipsum " * 500) + "Done. Next sentence here."
+    sents = list(iter_sentences(io.StringIO(text), sentencizer, window_chars=100, max_sentence_chars=1000))
+    assert all(len(s) <= 1100 for s in sents)
+    assert " ".join(sents).split() == text.split()
+    assert sents[-1] == "Next sentence here."
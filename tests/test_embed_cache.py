@@ -0,0 +1,73 @@
+import numpy as np
+from embed_cache import EmbeddingCache
+
+def vecs(n, dim=4, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+def test_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    keys = [EmbeddingCache.key("m", True, t) for t in ["a", "b", "c"]]
+    v = vecs(2)
+    cache.add(keys[:2], v)
+    assert keys[0] in cache and keys[1] in cache
+    assert keys[2] not in cache and cache.get(keys[2]) is None
+    np.testing.assert_array_equal(cache.get(keys[1]), v[1])
+
+def test_key_covers_model_and_normalization():
+    base = EmbeddingCache.key("m", True, "text")
+    assert base == EmbeddingCache.key("m", True, "text")
+    assert base != EmbeddingCache.key("other", True, "text")
+    assert base != EmbeddingCache.key("m", False, "text")
+    assert base != EmbeddingCache.key("m", True, "text ")
+
+def test_persists_across_reopen(tmp_path):
+    keys = [EmbeddingCache.key("m", True, t) for t in ["a", "b"]]
+    v = vecs(2)
+    EmbeddingCache(tmp_path).add(keys, v)
+    reopened = EmbeddingCache(tmp_path)
+    assert len(reopened) == 2
+    np.testing.assert_array_equal(reopened.get(keys[0]), v[0])
+
+def test_skips_keys_past_end_of_vectors(tmp_path):
+    keys = [EmbeddingCache.key("m", True, t) for t in ["a", "b"]]
+    cache = EmbeddingCache(tmp_path)
+    cache.add(keys[:1], vecs(1))
+    with open(cache.key_file, 'a') as f: f.write(f"{keys[1]}\t4\t4\n")
+    reopened = EmbeddingCache(tmp_path)
+    assert keys[0] in reopened and keys[1] not in reopened
+
+def test_survives_torn_writes(tmp_path):
+    keys = [EmbeddingCache.key("m", True, t) for t in ["a", "b", "c"]]
+    v = vecs(3)
+    cache = EmbeddingCache(tmp_path)
+    cache.add(keys[:1], v[:1])
+    # Crash mid-write: half a float in vectors.f32, half a line in keys.tsv
+    with open(cache.vec_file, 'ab') as f: f.write(b'\x00\x01')
+    with open(cache.key_file, 'a') as f: f.write(f"{keys[2]}\t4\t")
+
+    reopened = EmbeddingCache(tmp_path)
+    np.testing.assert_array_equal(reopened.get(keys[0]), v[0])
+    assert keys[2] not in reopened
+    reopened.add(keys[1:2], v[1:2])
+
+    final = EmbeddingCache(tmp_path)
+    assert len(final) == 2
+    np.testing.assert_array_equal(final.get(keys[0]), v[0])
+    np.testing.assert_array_equal(final.get(keys[1]), v[1])
+    assert final.vec_file.stat().st_size == 8 * 4
+
+def test_writers_pick_up_each_others_keys(tmp_path):
+    keys = [EmbeddingCache.key("m", True, t) for t in ["a", "b", "c"]]
+    v = vecs(3)
+    a, b = EmbeddingCache(tmp_path), EmbeddingCache(tmp_path)
+    a.add(keys[:1], v[:1])
+    # b has not seen "a"; it catches up under the lock instead of appending it twice
+    b.add(keys[:2], v[:2])
+    a.add(keys[2:], v[2:])
+    for cache in (a, b, EmbeddingCache(tmp_path)):
+        assert keys[1] in cache
+        np.testing.assert_array_equal(cache.get(keys[1]), v[1])
+    assert keys[2] in a and keys[2] not in b
+    with open(a.key_file) as f: assert len(f.readlines()) == 3
+    # Only bytes past the last parsed line are read on the next add
+    assert a._key_pos == a.key_file.stat().st_size
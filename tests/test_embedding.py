@@ -0,0 +1,80 @@
+import numpy as np
+import embedding
+from embedding import encode_bucketed, plan_buckets
+
+class FakeModel:
+    """Deterministic stand-in: one whitespace token per word, vector from the text."""
+    max_seq_length = 256
+
+    def __init__(self):
+        self.calls = []
+        self.pools = 0
+
+    def tokenizer(self, texts, truncation=True, max_length=None):
+        return {'input_ids': [t.split()[:max_length] for t in texts]}
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def start_multi_process_pool(self, devices):
+        self.pools += 1
+        return {'processes': devices}
+
+    def stop_multi_process_pool(self, pool):
+        pass
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, pool=None, **kwargs):
+        self.calls.append((list(texts), batch_size, pool is not None))
+        out = np.array([[len(t), sum(map(ord, t)) % 97, *(ord(c) for c in t[:6].ljust(6))] for t in texts], dtype=np.float32)
+        if normalize_embeddings: out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+def mixed_texts():
+    return [("word " * n).strip() + f" {i}" for i, n in enumerate([3, 400, 12, 1, 90, 3, 250, 40, 7])]
+
+def test_output_follows_input_order():
+    model = FakeModel()
+    texts = mixed_texts()
+    out = encode_bucketed(model, texts)
+    expected = FakeModel().encode(texts, normalize_embeddings=True)
+    np.testing.assert_allclose(out, expected)
+    # Buckets really were split by length
+    assert len(model.calls) > 1
+
+def test_batch_sizes_respect_budget():
+    lens = [1, 3, 7, 12, 40, 90, 250, 256, 256]
+    for budget, max_batch in [(16384, 512), (1000, 64), (100, 8)]:
+        plan = plan_buckets(lens, token_budget=budget, max_batch=max_batch)
+        assert sorted(i for idx, _ in plan for i in idx) == list(range(len(lens)))
+        for idx, batch_size in plan:
+            longest = max(lens[i] for i in idx)
+            assert 1 <= batch_size <= max_batch
+            assert batch_size == 1 or batch_size * longest <= budget
+
+def test_pooled_matches_unpooled(monkeypatch):
+    monkeypatch.setattr(embedding.os, "cpu_count", lambda: 4)
+    texts = mixed_texts()
+    single = FakeModel()
+    pooled = FakeModel()
+    a = encode_bucketed(single, texts, workers=1)
+    b = encode_bucketed(pooled, texts, workers=4, pool_min=1)
+    assert single.pools == 0 and pooled.pools == 1
+    assert all(used_pool for _, _, used_pool in pooled.calls)
+    np.testing.assert_array_equal(a, b)
+
+def test_pooled_encoder_starts_one_pool_for_many_calls(monkeypatch):
+    monkeypatch.setattr(embedding.os, "cpu_count", lambda: 4)
+    model = FakeModel()
+    loads = []
+    texts = mixed_texts()
+    with embedding.PooledEncoder(lambda: loads.append(1) or model, workers=4, pool_min=5) as encoder:
+        assert loads == []  # nothing loaded until there is something to encode
+        small = encoder.encode(texts[:2])
+        assert model.pools == 0 and not any(p for _, _, p in model.calls)
+        for _ in range(3): big = encoder.encode(texts)
+        # Once running, the pool also serves later batches too small to start one
+        encoder.encode(texts[:2])
+        assert model.pools == 1 and model.calls[-1][2]
+    assert loads == [1] and encoder.pool is None
+    np.testing.assert_array_equal(big, encode_bucketed(FakeModel(), texts, workers=1))
+    np.testing.assert_array_equal(small, encode_bucketed(FakeModel(), texts[:2], workers=1))
@@ -0,0 +1,105 @@
+import sys
+import csv
+import json
+from pathlib import Path
+import pytest
+import elerag_improved as elerag
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import generate_huge_corpus as gen
+import eval_retrieval
+
+def generate(tmp_path, name="c.csv", **kwargs):
+    out = str(tmp_path / name)
+    counts = gen.generate_huge_csv(out, **kwargs)
+    with open(out, newline='', encoding='utf-8') as f: rows = list(csv.DictReader(f))
+    queries, qrels = eval_retrieval.load_eval_set(out[:-4])
+    return counts, rows, queries, qrels
+
+def test_seeded_and_independent_of_query_count(tmp_path):
+    _, a, qa, _ = generate(tmp_path, "a.csv", rows=2000, seed=5, queries=50)
+    _, b, qb, _ = generate(tmp_path, "b.csv", rows=2000, seed=5, queries=50)
+    _, c, _, _ = generate(tmp_path, "c.csv", rows=2000, seed=5, queries=7)
+    _, d, _, _ = generate(tmp_path, "d.csv", rows=2000, seed=6, queries=50)
+    assert a == b and qa == qb
+    assert a == c
+    assert a != d
+
+def test_ratios(tmp_path):
+    counts, rows, _, _ = generate(tmp_path, rows=20000, ambiguity=0.3, noise=0.1, queries=10)
+    assert len(rows) == sum(counts.values()) == 20000
+    assert abs(counts["confuser"] / 20000 - 0.3) < 0.02
+    assert abs(counts["noise"] / 20000 - 0.1) < 0.02
+    assert sum(r["Unit"] == "Noise" for r in rows) == counts["noise"]
+    with pytest.raises(ValueError): gen.generate_huge_csv(str(tmp_path / "x.csv"), rows=10, ambiguity=0.7, noise=0.5)
+
+def detail_words(fact):
+    return frozenset(fact.rsplit(" with ", 1)[1].rstrip(".").split(", "))
+
+def test_qrels_point_at_the_asked_for_sense(tmp_path):
+    _, rows, queries, qrels = generate(tmp_path, rows=3000, seed=1, queries=100)
+    assert len(queries) == 200 and len({q["id"] for q in queries}) == 200
+    code_queries = [q for q in queries if q["kind"] == "code"]
+    assert len(code_queries) == 100
+    for q in code_queries:
+        (doc_id,) = qrels[q["id"]]
+        row = rows[doc_id]
+        assert (row["Subtopic"], row["Unit"]) == (q["word"], q["domain"])
+        code = gen.row_code(q["word"], doc_id)
+        assert code in q["query"] and code in row["Fact"]
+        # ingest keeps every generated row, so the row number is the doc id
+        assert len(f"[{row['Unit']} - {row['Subtopic']}] {row['Fact']}") > 20
+
+def test_topic_queries_mark_every_matching_row(tmp_path):
+    _, rows, queries, qrels = generate(tmp_path, rows=200_000, seed=2, queries=30)
+    shared = 0
+    for q in queries:
+        if q["kind"] != "topic": continue
+        target = rows[min(qrels[q["id"][:-1] + "c"])]
+        assert target["Unit"] == q["domain"]
+        # No entry code, so only content can find the rows
+        assert "Entry" not in q["query"] and "-0" not in q["query"]
+        detail = detail_words(target["Fact"])
+        assert all(word in q["query"] for word in detail)
+        expected = {i for i, r in enumerate(rows) if (r["Subtopic"], r["Unit"]) == (q["word"], q["domain"])
+                    and " Entry " in r["Fact"] and detail_words(r["Fact"]) == detail}
+        assert qrels[q["id"]] == expected
+        shared += len(expected) > 1
+    assert len(queries) == 60 and shared > 5
+
+class OracleIndex:
+    """Ranks a relevant doc first on the dense leg and a wrong-sense doc on the entity leg."""
+
+    def __init__(self, rows, qrels, queries):
+        self.rows, self.by_query = rows, {q["query"]: min(qrels[q["id"]]) for q in queries}
+        self.noise = next(i for i, r in enumerate(rows) if r["Unit"] == "Noise")
+
+    def search(self, query_vec, q_ents, dense_k, entity_k):
+        return [(self.by_query[query_vec], 1.0)], [(self.noise, 1.0)]
+
+    def fetch(self, ids):
+        return {i: {"text": f"[{self.rows[i]['Unit']} - {self.rows[i]['Subtopic']}] {self.rows[i]['Fact']}"} for i in ids}
+
+def test_evaluate_scores_each_leg(tmp_path, monkeypatch):
+    _, rows, queries, qrels = generate(tmp_path, rows=500, queries=20)
+    queries = [q for q in queries if q["kind"] == "code"]
+    monkeypatch.setattr(elerag, "encode_query", lambda q: q)
+    monkeypatch.setattr(elerag, "extract_entities", lambda q: [])
+    results = eval_retrieval.evaluate(OracleIndex(rows, qrels, queries), queries, qrels, ks=(1, 5))
+    perfect, missed = {"@1": 1.0, "@5": 1.0}, {"@1": 0.0, "@5": 0.0}
+    assert results["dense"] == {"recall": perfect, "hit": perfect, "disambiguation_accuracy": 1.0}
+    assert results["entity"] == {"recall": missed, "hit": missed, "disambiguation_accuracy": 0.0}
+    # RRF ties break by insertion order, so the dense hit stays first
+    assert results["fused"]["recall"] == perfect
+    assert list(results["by_kind"]) == ["code"] and results["by_kind"]["code"]["queries"] == 20
+
+def test_evaluate_splits_topic_queries(tmp_path, monkeypatch):
+    _, rows, queries, qrels = generate(tmp_path, rows=50_000, seed=4, queries=20)
+    monkeypatch.setattr(elerag, "encode_query", lambda q: q)
+    monkeypatch.setattr(elerag, "extract_entities", lambda q: [])
+    results = eval_retrieval.evaluate(OracleIndex(rows, qrels, queries), queries, qrels, ks=(1,))
+    code, topic = results["by_kind"]["code"]["dense"], results["by_kind"]["topic"]["dense"]
+    assert code["recall"]["@1"] == topic["hit"]["@1"] == 1.0
+    # One hit out of several relevant rows is a hit but not full recall
+    expected = sum(1 / len(qrels[q["id"]]) for q in queries if q["kind"] == "topic") / 20
+    assert topic["recall"]["@1"] == round(expected, 4) < 1.0
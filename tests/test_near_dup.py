@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from pathlib import Path
+from near_dup import NearDupFilter, exact_digest, shingles
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+BODY = ("Please review the attached gas supply agreement before Friday. The pricing terms in section four "
+        "were revised after the call with the trading desk, and legal still needs to sign off on the "
+        "termination clause before we send it to the counterparty. Let me know if you have questions.")
+
+def test_catches_near_duplicates_only():
+    f = NearDupFilter(0.8)
+    assert f.check(BODY) is None
+    assert f.check(BODY + " Thanks, Jeff") == 0  # signature variant
+    assert f.check("Lunch is moved to the third floor conference room on Tuesday at noon.") is None
+    assert len(f) == 2
+
+def test_threshold_is_tunable():
+    variant = BODY.replace("Friday", "Monday").replace("four", "five") + " Forwarded by Sara."
+    strict, loose = NearDupFilter(0.98), NearDupFilter(0.5)
+    for f in (strict, loose): f.check(BODY)
+    assert strict.check(variant) is None
+    assert loose.check(variant) == 0
+
+def test_signatures_stable_across_processes():
+    code = "import sys; sys.path.insert(0, %r)\nfrom near_dup import NearDupFilter\nprint(NearDupFilter().signature(%r).tolist())" % (str(SRC), BODY)
+    runs = {subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout for _ in range(2)}
+    assert len(runs) == 1
+    assert runs.pop().strip() == str(NearDupFilter().signature(BODY).tolist())
+
+def test_exact_digest_and_short_texts():
+    assert exact_digest("a") == exact_digest("a") != exact_digest("b")
+    assert shingles("two words") == {"two words"}
+
+def test_state_per_document_stays_small():
+    import random
+    import tracemalloc
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(5000)]
+    texts = [" ".join(rng.choices(words, k=60)) for _ in range(5000)]
+    tracemalloc.start()
+    f = NearDupFilter()
+    for t in texts: assert f.check(t) is None
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(f) == 5000 and held / len(f) < 3000
+    # Everything kept is still found after the tables have grown
+    assert f.check(texts[17] + " (forwarded)") == 17
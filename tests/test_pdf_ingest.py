@@ -0,0 +1,104 @@
+import os
+import sys
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import pdf_ingest
+
+# Stand-in "PDFs": text files whose pages are separated by form feeds. Workers
+# run in threads so the fakes can record calls and control completion order.
+DELAYS = {}
+CALLS = []
+DONE = []
+
+def fake_count_pages(filepath):
+    text = Path(filepath).read_text()
+    if text.startswith("BROKEN"): raise ValueError("not a PDF")
+    return len(text.split("\f"))
+
+def fake_extract_pages(filepath, start, end):
+    CALLS.append(os.path.basename(filepath))
+    time.sleep(DELAYS.get(os.path.basename(filepath), 0))
+    DONE.append(os.path.basename(filepath))
+    return "".join(Path(filepath).read_text().split("\f")[start:end])
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pdf_ingest, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(pdf_ingest, "count_pages", fake_count_pages)
+    monkeypatch.setattr(pdf_ingest, "extract_pages", fake_extract_pages)
+    monkeypatch.setattr(pdf_ingest, "PAGES_PER_TASK", 1)
+    monkeypatch.setattr(pdf_ingest, "WORKERS", 8)
+    DELAYS.clear()
+    CALLS.clear()
+    DONE.clear()
+    (tmp_path / pdf_ingest.PDF_SOURCE_FOLDER).mkdir()
+    return tmp_path
+
+def write_pdf(name, *pages):
+    path = Path(pdf_ingest.PDF_SOURCE_FOLDER) / name
+    # Page text ends in a newline, as pypdf's usually does
+    path.write_text("\f".join(p + "\n" for p in pages))
+    return path
+
+def facts():
+    with open(pdf_ingest.OUTPUT_CSV, newline='', encoding='utf-8') as f: return [row["Fact"] for row in csv.DictReader(f)]
+
+def manifest():
+    with open(pdf_ingest.MANIFEST_FILE) as f: return json.load(f)
+
+def test_unchanged_file_is_skipped(workdir):
+    write_pdf("a.pdf", "The first fact about contracts is here.", "The second fact about contracts is here.")
+    pdf_ingest.process_pdfs()
+    before = facts()
+    assert before == ["The first fact about contracts is here.", "The second fact about contracts is here."]
+    CALLS.clear()
+    pdf_ingest.process_pdfs()
+    assert CALLS == [] and facts() == before
+
+def test_touched_but_identical_file_is_skipped_and_refreshed(workdir):
+    path = write_pdf("a.pdf", "The only fact in this document is here.")
+    pdf_ingest.process_pdfs()
+    old = manifest()["a.pdf"]
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    CALLS.clear()
+    pdf_ingest.process_pdfs()
+    assert CALLS == []
+    new = manifest()["a.pdf"]
+    assert new["mtime_ns"] == old["mtime_ns"] + 5_000_000_000 and new["sha256"] == old["sha256"]
+    assert facts() == ["The only fact in this document is here."]
+
+def test_facts_already_in_csv_are_not_rewritten(workdir):
+    write_pdf("a.pdf", "Shared sentence that appears in both files. Only in the first file, long enough.")
+    pdf_ingest.process_pdfs()
+    write_pdf("b.pdf", "Shared sentence that appears in both files. Only in the second file, long enough.")
+    pdf_ingest.process_pdfs()
+    assert facts() == ["Shared sentence that appears in both files.", "Only in the first file, long enough.",
+                       "Only in the second file, long enough."]
+
+def test_output_order_ignores_completion_order(workdir):
+    for name, delay in [("a.pdf", 0.3), ("b.pdf", 0.1), ("c.pdf", 0.0)]:
+        write_pdf(name, f"Page one of {name} has a fact.", f"Page two of {name} has a fact.")
+        DELAYS[name] = delay
+    pdf_ingest.process_pdfs()
+    # c finished first, but the CSV follows file order, then page order
+    assert DONE[0] == "c.pdf" and DONE[-1] == "a.pdf"
+    assert facts() == [f"Page {p} of {n} has a fact." for n in ["a.pdf", "b.pdf", "c.pdf"] for p in ["one", "two"]]
+
+def test_failed_file_is_left_out_of_manifest(workdir):
+    write_pdf("a.pdf", "A perfectly readable fact sits here.")
+    write_pdf("b.pdf", "BROKEN")
+    pdf_ingest.process_pdfs()
+    assert set(manifest()) == {"a.pdf"}
+    assert facts() == ["A perfectly readable fact sits here."]
+    # Still pending, so the next run tries it again
+    write_pdf("b.pdf", "Now the second file reads fine too.")
+    pdf_ingest.process_pdfs()
+    assert set(manifest()) == {"a.pdf", "b.pdf"}
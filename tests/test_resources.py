@@ -0,0 +1,29 @@
+import pytest
+from resources import ResourceManager
+
+def test_loads_once_on_first_access():
+    calls = []
+    res = ResourceManager()
+    res.register("model", lambda: calls.append(1) or "loaded")
+    assert not res.is_loaded("model") and calls == []
+    assert res.model == "loaded" and res.get("model") == "loaded"
+    assert calls == [1]
+    assert "model" in res.timings
+
+def test_set_overrides_loader():
+    res = ResourceManager()
+    res.register("model", lambda: pytest.fail("loader should not run"))
+    res.set("model", "fake")
+    assert res.model == "fake"
+
+def test_unknown_resource():
+    with pytest.raises(AttributeError):
+        ResourceManager().missing
+
+def test_report_totals():
+    res = ResourceManager()
+    res.register("model", lambda: None)
+    res.model
+    lines = res.report({"import": 0.5})
+    assert lines[0].split()[0] == "import"
+    assert lines[-1].split()[0] == "total"
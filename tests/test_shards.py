@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from shards import ShardedIndex, shard_bounds
+from snapshots import Snapshot, publish_snapshot
+
+def make_corpus(n=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    vecs[50:60] = vecs[5]  # exact ties across shard boundaries
+    ents = [("wiki", "Q1"), ("wiki", "Q2"), ("text", "2001")]
+    entities = [[ents[j] for j in range(3) if (i + j) % (j + 3) == 0] for i in range(n)]
+    return [f"doc {i}" for i in range(n)], vecs, entities
+
+def brute_force(vecs, entities, q, q_ents, k=15):
+    # The original query_system: stable sorts over memory order
+    q = q.astype(np.float64)
+    scores = [float(np.dot(q, v) / (np.linalg.norm(q) * np.linalg.norm(v.astype(np.float64)))) for v in vecs]
+    dense = sorted(range(len(vecs)), key=lambda i: scores[i], reverse=True)[:k]
+    hits = [(i, len(set(e) & set(q_ents))) for i, e in enumerate(entities)]
+    entity = sorted([h for h in hits if h[1] > 0], key=lambda h: h[1], reverse=True)[:k]
+    return dense, entity
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return publish_snapshot(tmp_path / "index", *make_corpus())
+
+def queries(vecs):
+    return [vecs[5]] + list(np.random.default_rng(1).normal(size=(5, vecs.shape[1])).astype(np.float32))
+
+def test_snapshot_search_matches_original_ranking(snapshot_path):
+    _, vecs, entities = make_corpus()
+    snap = Snapshot(snapshot_path)
+    q_ents = [("wiki", "Q1"), ("text", "2001")]
+    for q in queries(vecs):
+        dense, entity = snap.search(q, q_ents)
+        want_dense, want_entity = brute_force(vecs, entities, q, q_ents)
+        assert [i for i, _ in dense] == want_dense
+        assert entity == want_entity
+    snap.close()
+
+def test_shard_bounds_cover_everything():
+    assert shard_bounds(10, 3) == [0, 4, 8]
+    assert shard_bounds(2, 5) == [0, 1]
+    assert shard_bounds(0, 4) == [0]
+
+@pytest.mark.parametrize("n_shards", [2, 3])
+def test_sharded_matches_single_index(snapshot_path, n_shards):
+    _, vecs, _ = make_corpus()
+    single = Snapshot(snapshot_path)
+    q_ents = [("wiki", "Q1"), ("text", "2001")]
+    with ShardedIndex(snapshot_path, n_shards) as sharded:
+        for q in queries(vecs):
+            assert sharded.search(q, q_ents) == single.search(q, q_ents)
+        got = sharded.fetch([0, 199, 57, 100])
+        want = single.fetch([0, 199, 57, 100])
+        assert got.keys() == want.keys()
+        for i in want:
+            assert got[i]["text"] == want[i]["text"]
+            np.testing.assert_array_equal(got[i]["vector"], want[i]["vector"])
+    single.close()
+
+def test_query_system_surfaces_shard_startup_errors(tmp_path, monkeypatch):
+    import elerag_improved as elerag
+    monkeypatch.setattr(elerag, "INDEX_DIR", tmp_path / "index")
+    assert elerag.query_system("anything") is None  # no snapshot yet: "Run 'ingest' first."
+
+    def broken(shards):
+        raise ConnectionRefusedError("shard worker died")
+    monkeypatch.setattr(elerag, "open_index", broken)
+    with pytest.raises(ConnectionRefusedError): elerag.query_system("anything", shards=2)
@@ -0,0 +1,74 @@
+import json
+import numpy as np
+from snapshots import Snapshot, SnapshotManager, atomic_write_json, current_snapshot, list_versions, publish_snapshot, KEEP_SNAPSHOTS
+
+def publish(index_dir, tag, n=5):
+    texts = [f"{tag} {i}" for i in range(n)]
+    vecs = np.eye(n, 4, dtype=np.float32) + 0.1
+    return publish_snapshot(index_dir, texts, vecs, [[("wiki", tag)]] * n)
+
+def test_publish_versions_and_current(tmp_path):
+    assert current_snapshot(tmp_path) is None
+    first = publish(tmp_path, "a")
+    second = publish(tmp_path, "b")
+    assert (first.name, second.name) == ("v000001", "v000002")
+    assert current_snapshot(tmp_path) == second
+    # Nothing half-written is left behind
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith('.')]
+
+def test_round_trip(tmp_path):
+    snap = Snapshot(publish(tmp_path, "a"))
+    assert len(snap) == 5 and snap.version == 1
+    doc = snap.fetch([3])[3]
+    assert doc["text"] == "a 3" and doc["entities"] == [["wiki", "a"]]
+    assert snap.search(doc["vector"], [("wiki", "a")])[1][0] == (0, 1)
+    snap.close()
+
+def test_old_snapshots_pruned(tmp_path):
+    for i in range(KEEP_SNAPSHOTS + 2): publish(tmp_path, str(i))
+    assert list_versions(tmp_path) == list(range(3, KEEP_SNAPSHOTS + 3))
+
+def test_hot_reload_waits_for_in_flight_queries(tmp_path):
+    publish(tmp_path, "old")
+    closed = []
+
+    class Tracked(Snapshot):
+        def close(self):
+            closed.append(self.version)
+            super().close()
+
+    manager = SnapshotManager(tmp_path, opener=Tracked)
+    assert not manager.maybe_reload()
+    with manager.acquire() as in_flight:
+        publish(tmp_path, "new")
+        assert manager.maybe_reload()
+        # The old view stays open while a query is using it
+        assert closed == [] and in_flight.fetch([0])[0]["text"] == "old 0"
+        with manager.acquire() as fresh: assert fresh.fetch([0])[0]["text"] == "new 0"
+    assert closed == [1]
+    manager.close()
+    assert closed == [1, 2]
+
+def test_atomic_write_json(tmp_path):
+    path = tmp_path / "cache.json"
+    atomic_write_json(path, {"a": 1})
+    atomic_write_json(path, {"b": 2})
+    assert json.loads(path.read_text()) == {"b": 2}
+    assert [p.name for p in tmp_path.iterdir()] == ["cache.json"]
+
+def test_postings_are_mapped_not_parsed(tmp_path):
+    import tracemalloc
+    n = 20000
+    ents = [[("wiki", f"Q{i % 500}"), ("text", f"jahr {i % 7} ü")] for i in range(n)]
+    path = publish_snapshot(tmp_path, [str(i) for i in range(n)], np.ones((n, 4), dtype=np.float32), ents)
+    tracemalloc.start()
+    snap = Snapshot(path, 5000, 15000)
+    opened = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # No per-key or per-posting Python objects: opening costs the same at any size
+    assert opened < 64 * 1024
+    for ent in [("wiki", "Q7"), ("text", "jahr 3 ü")]:
+        expected = [i for i in range(5000, 15000) if ent in ents[i]]
+        assert snap.entity_ids(ent).tolist() == expected
+    assert len(snap.entity_ids(("wiki", "missing"))) == 0
+    snap.close()
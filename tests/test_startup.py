@@ -0,0 +1,23 @@
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+def heavy_modules_after_import(module):
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "import %s\n"
+        "heavy = [m for m in ('spacy', 'sentence_transformers', 'torch', 'requests') if m in sys.modules]\n"
+        "print(heavy)\n"
+    ) % (str(SRC), module)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return out.stdout.strip()
+
+def test_embedding_import_loads_no_models():
+    # Pool workers are spawned and re-import the caller's modules, so this one must stay cheap
+    assert heavy_modules_after_import("embedding") == "[]"
+
+def test_import_loads_no_models():
+    # The embedding pool's spawned workers re-run the main module, which imports this one
+    assert heavy_modules_after_import("elerag_improved") == "[]"
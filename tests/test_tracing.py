@@ -0,0 +1,52 @@
+import json
+import pytest
+import tracing
+
+@pytest.fixture
+def metrics(monkeypatch):
+    m = tracing.Metrics()
+    monkeypatch.setattr(tracing, "METRICS", m)
+    monkeypatch.setattr(tracing, "SINKS", [])
+    return m
+
+def test_stage_and_count_without_trace_are_noops():
+    with tracing.stage("anything"): tracing.count("events")
+    assert tracing.current() is None
+
+def test_nested_trace_joins_outer(metrics):
+    finished = []
+    tracing.SINKS.append(finished.append)
+    with tracing.trace("query", query="q") as outer:
+        with tracing.trace("query") as inner: assert inner is outer
+        with tracing.stage("dense_scoring"): tracing.count("candidates_scored", 7)
+        with tracing.stage("dense_scoring"): tracing.count("candidates_scored", 3)
+    assert finished == [outer]
+    d = outer.to_dict()
+    assert d["kind"] == "query" and d["query"] == "q"
+    assert set(d["stages_ms"]) == {"dense_scoring"}
+    assert d["counters"] == {"candidates_scored": 10}
+    json.dumps(d)
+
+def test_metrics_accumulate_and_render(metrics):
+    for _ in range(3):
+        with tracing.trace("query"):
+            with tracing.stage("rrf"): tracing.count("prompt_chars", 100)
+    text = metrics.render()
+    assert 'elerag_requests_total{kind="query"} 3' in text
+    assert 'elerag_events_total{kind="query",name="prompt_chars"} 300' in text
+    assert 'elerag_stage_requests_total{kind="query",stage="rrf"} 3' in text
+    assert "# TYPE elerag_stage_seconds_total counter" in text
+
+def test_trace_finishes_on_error(metrics):
+    with pytest.raises(RuntimeError):
+        with tracing.trace("ingest"): raise RuntimeError
+    assert tracing.current() is None
+    assert metrics.requests == {"ingest": 1}
+
+def test_profiled_modes(tmp_path, capsys):
+    with tracing.profiled("cprofile", out_prefix=str(tmp_path / "prof")): sum(range(1000))
+    assert (tmp_path / "prof.pstats").exists()
+    with tracing.profiled("tracemalloc"): [0] * 1000
+    assert "tracemalloc: current" in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        with tracing.profiled("perf"): pass